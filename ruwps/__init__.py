@@ -16,6 +16,7 @@ __author__ = '59de44955ebd'
 __license__ = 'MIT'
 __copyright__ = 'Copyright 2024 https://github.com/59de44955ebd'
 
-from ._internal import (alert, application_support, debug_mode, notification, quit_application, timers,
-        App, MenuItem, Timer, Window, timer, clicked, notifications, separator)
+from ._internal import (alert, alert_async, application_support, debug_mode, is_cancelled, notification,
+        quit_application, timers, App, Job, MenuItem, Supervisor, Timer, Window, timer, schedule, clicked,
+        notifications, separator)
 del _internal
@@ -1,15 +1,26 @@
-﻿import inspect
+﻿import asyncio
+import contextlib
+import datetime
+import functools
 import os
 import sys
+import threading
 import traceback
+import weakref
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
 
 from ctypes import byref, create_unicode_buffer
 from ctypes.wintypes import POINT, RECT
 
+from .winapp.bitmapcache import BitmapCache
 from .winapp.const import *
+from .winapp.cron import CronExpression
 from .winapp.dialog import Dialog
 from .winapp.dlls import kernel32, user32
 from .winapp.mainwin import MainWin
+from .winapp.profiler import PROFILER
+from .winapp.supervisor import ProcessSupervisor
 from .winapp.menu import MENUITEMINFOW
 from .winapp.themes import reg_should_use_dark_mode
 from .winapp.trayicon import *
@@ -18,16 +29,30 @@ from .winapp.wintypes_extended import *
 separator = object()
 
 class SeparatorItem(object):
-    pass
+    _parent = None
 
 _app = None
 
+_bound_callbacks = weakref.WeakKeyDictionary()  # callback => True if it's a method of the App (sub)class
+
+_callback_tasks = set()  # strong references to running coroutine callbacks
+
+_background_executor = None
+_background_local = threading.local()  # .cancelled: threading.Event of the background run of the current thread
+
+_menu_batch_depth = 0
+_menu_batch_dirty = {}
+
 _MYWM_NOTIFYICON = 1025
 _NO_APP_ERROR = RuntimeError('No app instance')
 _TIMERS = []
 _USE_DARK = reg_should_use_dark_mode(True)
 _IS_FROZEN = getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS')
 _MENU_ICON_SIZE = 16
+_BACKGROUND_WORKERS = 4
+_REENTRANCY_MODES = ('skip', 'queue', 'cancel')
+_MISSED_TICK_MODES = ('skip', 'catchup')
+_BITMAP_CACHE = BitmapCache()
 
 # If no icon was specified in App's constructor, we could use a system icon like IDI_APPLICATION,
 # using: hicon = user32.LoadIconW(0, MAKEINTRESOURCEW(IDI_APPLICATION))
@@ -35,38 +60,205 @@ _MENU_ICON_SIZE = 16
 _DEFAULT_ICO_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'resources', 'default.ico')
 
 ########################################
-#
+# Menu command ids are only held by MenuItems that are part of the native menu and are recycled when they leave it.
+# WM_COMMAND only passes 16 bits, and 0 is what TrackPopupMenuEx returns if the menu was dismissed.
 ########################################
-_id_counter = 0
-def _unique_id():
-    global _id_counter
-    id = _id_counter
-    _id_counter += 1
-    return id
+class _IdAllocator(object):
+
+    def __init__(self, first=1, last=0xFFFF):
+        self.__next = first
+        self.__last = last
+        self.__free = []
+
+    def allocate(self):
+        if self.__free:
+            return self.__free.pop()
+        if self.__next > self.__last:
+            raise RuntimeError('Out of menu command ids')
+        id = self.__next
+        self.__next += 1
+        return id
+
+    def free(self, id):
+        self.__free.append(id)
+
+_COMMAND_IDS = _IdAllocator()
+
+def _index_menu_item(menuitem):
+    menuitem.id = _COMMAND_IDS.allocate()
+    _app._command_message_map[menuitem.id] = menuitem
+
+def _unindex_menu_item(menuitem):
+    del _app._command_message_map[menuitem.id]
+    _COMMAND_IDS.free(menuitem.id)
+    menuitem.id = None
 
 ########################################
+# Native menu sync
 #
+# Every MenuItem that has been rendered remembers the native state it was rendered with: _parent (the MenuItem
+# whose HMENU it lives in), _native (caption, state, icon and submenu flag) and - if it has children -
+# _hmenu (its own popup HMENU) and _rendered (the list of children currently inserted into _hmenu).
+# A mutation then only diffs the affected HMENU against its MenuItem and touches the items that actually changed.
+# Submenus of lazy apps and of MenuItems with a provider are only filled (_materialized) on WM_INITMENUPOPUP.
 ########################################
-def _make_menu_data(parent_dict, menuitem):
+def _menu_item_native(menuitem):
+    caption = str(menuitem.title)
+    if menuitem.key:
+        caption += '\t' + menuitem.key
+    has_submenu = len(menuitem.child_dict) > 0 or menuitem.provider is not None
+    state = MFS_CHECKED if menuitem.state else MFS_UNCHECKED
+    if not has_submenu and not menuitem.callback:
+        state |= MFS_GRAYED
+    return caption, state, menuitem.icon, has_submenu
+
+def _is_lazy(menuitem):
+    return _app.lazy_menus or menuitem.provider is not None
+
+def _create_submenu(menuitem):
+    menuitem._hmenu = user32.CreatePopupMenu()
+    _app._submenus[menuitem._hmenu] = menuitem
+    return menuitem._hmenu
+
+def _set_menu_bitmap(menuitem, icon):
+    # bitmaps are shared by all items using the same file, so they are only released here, never deleted
+    if menuitem._hbitmap:
+        _BITMAP_CACHE.release(menuitem._hbitmap)
+    menuitem._hbitmap = _BITMAP_CACHE.acquire(icon, _MENU_ICON_SIZE, _USE_DARK) if icon else 0
+    return menuitem._hbitmap
+
+def _insert_menu_item(parent, pos, menuitem):
+    if menuitem._parent is not None:
+        # moved over from another (sub)menu, keep its native submenu
+        _remove_menu_item(menuitem._parent, menuitem, detach=False)
+    info = MENUITEMINFOW()
     if type(menuitem) == SeparatorItem:
-        parent_dict['items'].append({'caption': '-'})
-        return
-    menu_dict = {'caption': menuitem.title, 'id': menuitem.id}
-    if menuitem.callback:
-        _app._command_message_map[menuitem.id] = menuitem
+        info.fMask = MIIM_FTYPE
+        info.fType = MFT_SEPARATOR
     else:
-        menu_dict['flags'] = 'GRAYED'
-    if menuitem.key:
-        menu_dict['caption'] += '\t' + menuitem.key
-    if menuitem.state:
-        menu_dict['flags'] = menu_dict['flags'] + 'CHECKED' if 'flags' in menu_dict else 'CHECKED'
-    if menuitem.icon:
-        menu_dict['hbitmap'] = user32.LoadImageW(0, menuitem.icon, IMAGE_BITMAP, _MENU_ICON_SIZE, _MENU_ICON_SIZE, LR_LOADFROMFILE)
-    parent_dict['items'].append(menu_dict)
-    if len(menuitem.values()):
-        menu_dict['items'] = []
-        for child_item in menuitem.values():
-            _make_menu_data(menu_dict, child_item)
+        caption, state, icon, has_submenu = native = _menu_item_native(menuitem)
+        if menuitem._native is None:
+            _index_menu_item(menuitem)
+        info.fMask = MIIM_FTYPE | MIIM_ID | MIIM_STATE | MIIM_STRING | MIIM_SUBMENU
+        info.fType = MFT_STRING
+        info.wID = menuitem.id
+        info.fState = state
+        info.dwTypeData = caption
+        if menuitem._native is None or menuitem._native[2] != icon:
+            _set_menu_bitmap(menuitem, icon)
+        if menuitem._hbitmap:
+            info.fMask |= MIIM_BITMAP
+            info.hbmpItem = menuitem._hbitmap
+        if has_submenu:
+            info.hSubMenu = menuitem._hmenu or _create_submenu(menuitem)
+        elif menuitem._hmenu:
+            _drop_submenu(menuitem)
+        menuitem._native = native
+    user32.InsertMenuItemW(parent._hmenu, pos, TRUE, byref(info))
+    parent._rendered.insert(pos, menuitem)
+    menuitem._parent = parent
+    if type(menuitem) != SeparatorItem and menuitem._hmenu and (menuitem._materialized or not _is_lazy(menuitem)):
+        _sync_menu(menuitem)
+
+def _remove_menu_item(parent, menuitem, detach=True, pos=None):
+    if pos is None:
+        pos = parent._rendered.index(menuitem)
+    user32.RemoveMenu(parent._hmenu, pos, MF_BYPOSITION)
+    del parent._rendered[pos]
+    menuitem._parent = None
+    if detach and type(menuitem) != SeparatorItem:
+        if menuitem._hmenu:
+            _drop_submenu(menuitem)
+        _set_menu_bitmap(menuitem, None)
+        menuitem._native = None
+        _unindex_menu_item(menuitem)
+
+def _drop_submenu(menuitem):
+    # DestroyMenu recurses natively, here we only have to forget the Python side of the subtree
+    user32.DestroyMenu(menuitem._hmenu)
+    del _app._submenus[menuitem._hmenu]
+    menuitem._hmenu = None
+    menuitem._materialized = False
+    stack = menuitem._rendered
+    menuitem._rendered = []
+    while stack:
+        child = stack.pop()
+        child._parent = None
+        if type(child) == SeparatorItem:
+            continue
+        if child._hmenu:
+            del _app._submenus[child._hmenu]
+            child._hmenu = None
+            child._materialized = False
+        _set_menu_bitmap(child, None)
+        child._native = None
+        _unindex_menu_item(child)
+        stack.extend(child._rendered)
+        child._rendered = []
+
+def _sync_menu_item(menuitem):
+    caption, state, icon, has_submenu = native = _menu_item_native(menuitem)
+    if native == menuitem._native:
+        return
+    old_caption, old_state, old_icon, had_submenu = menuitem._native
+    info = MENUITEMINFOW()
+    if caption != old_caption:
+        info.fMask |= MIIM_STRING
+        info.dwTypeData = caption
+    if state != old_state:
+        info.fMask |= MIIM_STATE
+        info.fState = state
+    if icon != old_icon:
+        info.fMask |= MIIM_BITMAP
+        info.hbmpItem = _set_menu_bitmap(menuitem, icon)
+    if has_submenu != had_submenu:
+        info.fMask |= MIIM_SUBMENU
+        if has_submenu:
+            info.hSubMenu = _create_submenu(menuitem)
+    user32.SetMenuItemInfoW(menuitem._parent._hmenu, menuitem.id, FALSE, byref(info))
+    menuitem._native = native
+    if has_submenu != had_submenu:
+        if not has_submenu:
+            _drop_submenu(menuitem)
+        elif not _is_lazy(menuitem):
+            _sync_menu(menuitem)
+
+def _sync_menu(menuitem):
+    menuitem._materialized = True
+    rendered = menuitem._rendered
+    items = menuitem.values()
+    keep = set(map(id, items))
+    for pos in range(len(rendered) - 1, -1, -1):
+        if id(rendered[pos]) not in keep:
+            _remove_menu_item(menuitem, rendered[pos], pos=pos)
+    for pos, child in enumerate(items):
+        if pos < len(rendered) and rendered[pos] is child:
+            if type(child) != SeparatorItem:
+                _sync_menu_item(child)
+        else:
+            _insert_menu_item(menuitem, pos, child)
+
+########################################
+# Menu changes made inside a batch are synced once, when the outermost batch exits
+########################################
+@contextlib.contextmanager
+def _menu_batch():
+    if _app is not None and not _app.is_ui_thread():
+        # mutations from other threads are marshalled one by one, see _on_ui_thread
+        yield
+        return
+    global _menu_batch_depth
+    _menu_batch_depth += 1
+    try:
+        yield
+    finally:
+        _menu_batch_depth -= 1
+        if _menu_batch_depth == 0 and _menu_batch_dirty:
+            dirty = list(_menu_batch_dirty.values())
+            _menu_batch_dirty.clear()
+            if isinstance(_app, App):
+                for menuitem in dirty:
+                    _app._update_menu(menuitem)
 
 ########################################
 #
@@ -78,15 +270,159 @@ def _call_as_function_or_method(func, *args, **kwargs):
     #
     # This works for an App subclass method or a standalone decorated function. Will attempt to find function as
     # a bound method of the App instance. If it is found, use it, otherwise simply call function.
-    if _app:
-        for name, method in inspect.getmembers(_app, predicate=inspect.ismethod):
-            if method.__func__ is func:
-                return method(*args, **kwargs)
-    return func(*args, **kwargs)
+    with _menu_batch():
+        if _resolve_callback(func):
+            func = func.__get__(_app)
+        if PROFILER.enabled and (_app is None or _app.is_ui_thread()):
+            res = PROFILER.call_callback(func, *args, **kwargs)
+        else:
+            res = func(*args, **kwargs)
+    if asyncio.iscoroutine(res):
+        if _app is not None and not _app.is_ui_thread():
+            # background callback, runs in a loop of its own worker thread
+            return asyncio.run(res)
+        return _create_callback_task(res)
+    return res
+
+########################################
+# Decorator for the App/MenuItem mutators, calls from other threads (background callbacks) are run on the UI thread,
+# the calling thread waits for the result.
+########################################
+def _on_ui_thread(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _app is None or _app.is_ui_thread():
+            return func(*args, **kwargs)
+        if is_cancelled():
+            raise CancelledError()
+        return _app.call_soon_threadsafe(func, *args, **kwargs).result()
+    return wrapper
+
+########################################
+# Runs a callback on the shared, bounded background thread pool. At most one run per callback site (MenuItem,
+# Timer) is active, what happens if it's triggered again while a run is still going depends on reentrancy:
+#   'skip':   the new trigger is ignored
+#   'queue':  the new trigger is run after the current one
+#   'cancel': the current run is cancelled (see is_cancelled) and the new one is started immediately
+########################################
+class _BackgroundRunner(object):
+
+    def __init__(self, reentrancy='skip'):
+        if reentrancy not in _REENTRANCY_MODES:
+            raise ValueError('reentrancy must be one of {}'.format(', '.join(_REENTRANCY_MODES)))
+        self.reentrancy = reentrancy
+        self._future = None
+        self._cancelled = None
+        self._queued = deque()
+
+    def submit(self, func, *args):
+        if self._future is not None:
+            if self.reentrancy == 'skip':
+                return
+            if self.reentrancy == 'queue':
+                self._queued.append((func, args))
+                return
+            self._cancelled.set()
+        self._start(func, args)
+
+    def is_running(self):
+        return self._future is not None
+
+    def _start(self, func, args):
+        global _background_executor
+        if _background_executor is None:
+            _background_executor = ThreadPoolExecutor(_BACKGROUND_WORKERS, thread_name_prefix='ruwps-background')
+        self._cancelled = cancelled = threading.Event()
+        self._future = future = _background_executor.submit(_run_in_background, func, args, cancelled)
+        app = _app
+        future.add_done_callback(lambda f: app.call_soon_threadsafe(self._done, f))
+
+    def _done(self, future):
+        if future is not self._future:  # a cancelled run
+            return
+        self._future = self._cancelled = None
+        if self._queued:
+            func, args = self._queued.popleft()
+            self._start(func, args)
+
+def _run_in_background(func, args, cancelled):
+    _background_local.cancelled = cancelled
+    try:
+        _call_as_function_or_method(func, *args)
+    except CancelledError:
+        pass
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        _background_local.cancelled = None
+
+def _run_callback(func, runner, *args):
+    if runner is None:
+        return _call_as_function_or_method(func, *args)
+    runner.submit(func, *args)
+
+def is_cancelled():
+    """Returns True if called from a background callback (``background=True``) whose run was cancelled because it
+    was triggered again with ``reentrancy='cancel'``. Changing the menu or app from a cancelled run raises
+    :class:`concurrent.futures.CancelledError`.
+    """
+    cancelled = getattr(_background_local, 'cancelled', None)
+    return cancelled is not None and cancelled.is_set()
+
+########################################
+# Coroutine callbacks are run as tasks of the event loop of App.run_async
+########################################
+def _create_callback_task(coro):
+    loop = _app.event_loop if _app is not None else None
+    if loop is None:
+        coro.close()
+        raise RuntimeError('coroutine callbacks require App.run_async()')
+    task = loop.create_task(coro)
+    _callback_tasks.add(task)
+    task.add_done_callback(_on_callback_task_done)
+    return task
+
+def _on_callback_task_done(task):
+    _callback_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        task.get_loop().call_exception_handler({
+                'message': 'Exception in callback coroutine',
+                'exception': task.exception(),
+                'task': task,
+                })
+
+########################################
+# Looks up (once per callback, see _bound_callbacks) if func is defined in the App's class hierarchy.
+# Only the class dicts are searched, so unlike inspect.getmembers no properties of the instance are evaluated.
+########################################
+def _resolve_callback(func):
+    try:
+        return _bound_callbacks[func]
+    except KeyError:
+        pass
+    except TypeError:  # not weak referenceable, so not cacheable
+        return _app is not None and _is_app_method(func)
+    is_method = _app is not None and _is_app_method(func)
+    _bound_callbacks[func] = is_method
+    return is_method
+
+def _is_app_method(func):
+    for klass in type(_app).__mro__:
+        for attr in vars(klass).values():
+            if attr is func:
+                return True
+    return False
+
+def _forget_callback(func):
+    try:
+        _bound_callbacks.pop(func, None)
+    except TypeError:
+        pass
 
 ########################################
 #
 ########################################
+@_on_ui_thread
 def alert(title='', message='', ok=None, cancel=None):
     global _app
     if _app is None:
@@ -94,6 +430,41 @@ def alert(title='', message='', ok=None, cancel=None):
         if _USE_DARK:
             _app.apply_theme(True)
 
+    dialog_dict, buttons = _alert_dialog_dict(title, message, ok, cancel)
+
+    def _dialog_proc_callback(hwnd, msg, wparam, lparam):
+        if msg == WM_COMMAND:
+            control_id = LOWORD(wparam)
+            command = HIWORD(wparam)
+            if command == BN_CLICKED:
+                user32.EndDialog(hwnd, control_id)
+        elif msg == WM_CLOSE:
+            user32.EndDialog(hwnd, len(buttons) - 1)
+        return FALSE
+
+    _log('alert opened with message: {0}, title: {1}'.format(repr(dialog_dict['controls'][0]['caption']),
+            repr(dialog_dict['caption'])))
+    btn_id = _app.dialog_show_sync(Dialog(_app, dialog_dict, _dialog_proc_callback))
+    # The “ok” button will return 1 and the “cancel” button will return 0.
+    return 1 - btn_id
+
+def alert_async(title='', message='', ok=None, cancel=None):
+    """Like :func:`alert`, but returns immediately instead of blocking until the alert is closed. The returned
+    future resolves to 1 (ok) or 0 (cancel) and can be awaited in :meth:`App.run_async`. Cancelling it closes
+    the alert. Can be called from any thread, several alerts can be open at once.
+
+    .. code-block:: python
+
+        future = rumps.alert_async('Delete?', 'This cannot be undone.', cancel=True)
+        if await future:
+            ...
+    """
+    def _build():
+        dialog_dict, buttons = _alert_dialog_dict(title, message, ok, cancel)
+        return dialog_dict, lambda hwnd, btn_id: 1 - btn_id, len(buttons) - 1, None
+    return _show_dialog_async(_build)
+
+def _alert_dialog_dict(title, message, ok, cancel):
     if title and not message:
         message = title
         title = ''
@@ -149,20 +520,89 @@ def alert(title='', message='', ok=None, cancel=None):
         })
         x += button_width + button_dist
 
-    def _dialog_proc_callback(hwnd, msg, wparam, lparam):
-        if msg == WM_COMMAND:
-            control_id = LOWORD(wparam)
-            command = HIWORD(wparam)
-            if command == BN_CLICKED:
-                user32.EndDialog(hwnd, control_id)
-        elif msg == WM_CLOSE:
-            user32.EndDialog(hwnd, len(buttons) - 1)
-        return FALSE
+    return dialog_dict, buttons
 
-    _log('alert opened with message: {0}, title: {1}'.format(repr(message), repr(title)))
-    btn_id = _app.dialog_show_sync(Dialog(_app, dialog_dict, _dialog_proc_callback))
-    # The “ok” button will return 1 and the “cancel” button will return 0.
-    return 1 - btn_id
+########################################
+# Future of a dialog shown with _show_dialog_async (alert_async, Window.run_async). It can be awaited in the
+# event loop of App.run_async, cancelling it closes the dialog.
+########################################
+class _DialogFuture(Future):
+
+    def __init__(self):
+        super().__init__()
+        self._dialog = None
+
+    def __await__(self):
+        return asyncio.wrap_future(self).__await__()
+
+    def cancel(self):
+        if not super().cancel():
+            return False
+        if _app is not None:
+            if _app.is_ui_thread():
+                self._close()
+            else:
+                _app.call_soon_threadsafe(self._close)
+        return True
+
+    def _close(self):
+        if self._dialog is not None and self._dialog.hwnd:
+            user32.SendMessageW(self._dialog.hwnd, WM_CLOSE, 0, 0)
+
+    def _resolve(self, result):
+        if not self.done() and self.set_running_or_notify_cancel():
+            self.set_result(result)
+
+    def _fail(self, exception):
+        if not self.done() and self.set_running_or_notify_cancel():
+            self.set_exception(exception)
+
+########################################
+# Shows a modeless dialog and returns a _DialogFuture. build() is called on the UI thread and returns
+# (dialog_dict, get_result, close_id, on_init): the future's result is get_result(hwnd, button_id) when a button
+# is clicked, or get_result(None, close_id) when the dialog is destroyed otherwise (closed, or destroyed with the
+# app's window when it quits). on_init(hwnd) (if not None) is called on WM_INITDIALOG. If the dialog can't be
+# shown, the future fails with the error.
+########################################
+def _show_dialog_async(build):
+    if _app is None:
+        raise _NO_APP_ERROR
+    future = _DialogFuture()
+
+    def _show():
+        if future.cancelled():
+            return
+        try:
+            dialog_dict, get_result, close_id, on_init = build()
+
+            def _dialog_proc_callback(hwnd, msg, wparam, lparam):
+                if msg == WM_INITDIALOG:
+                    if on_init is not None:
+                        on_init(hwnd)
+                elif msg == WM_COMMAND:
+                    if HIWORD(wparam) == BN_CLICKED and lparam:
+                        future._resolve(get_result(hwnd, LOWORD(wparam)))
+                        user32.PostMessageW(hwnd, WM_CLOSE, 0, 0)
+                    elif LOWORD(wparam) == IDCANCEL and not lparam:  # escape key
+                        user32.PostMessageW(hwnd, WM_CLOSE, 0, 0)
+                elif msg == WM_NCDESTROY:
+                    future._resolve(get_result(None, close_id))
+                return FALSE
+
+            future._dialog = Dialog(_app, dialog_dict, _dialog_proc_callback)
+            _app.dialog_show_async(future._dialog)
+        except Exception as e:
+            future._fail(e)
+
+    if _app.is_ui_thread():
+        _show()
+    else:
+        # the call fails if the app quits before _show runs
+        def _on_call_done(call):
+            if call.exception() is not None:
+                future._fail(call.exception())
+        _app.call_soon_threadsafe(_show).add_done_callback(_on_call_done)
+    return future
 
 ########################################
 #
@@ -190,9 +630,13 @@ def debug_mode(choice):
             pass
 debug_mode(False)
 
+def _log_stall(stalled, stack):
+    _log('UI thread stalled for {:.0f} ms:\n{}'.format(stalled * 1000, stack))
+
 ########################################
 #
 ########################################
+@_on_ui_thread
 def notification(title='', subtitle='', message='', data=None, sound=True, win_flags=NIIF_INFO):
     if _app is None:
         raise _NO_APP_ERROR
@@ -227,43 +671,62 @@ def timers():
 ########################################
 class MenuItem(object):
 
-    def __init__(self, title, callback=None, key=None, icon=None, dimensions=None, template=None):
+    def __init__(self, title, callback=None, key=None, icon=None, dimensions=None, template=None, provider=None,
+            background=False, reentrancy='skip'):
         self._title = title
         self.callback = callback
+        # if background is True, the callback is run on a worker thread, see _BackgroundRunner
+        self._runner = _BackgroundRunner(reentrancy) if background else None
+        # called as provider(sender) whenever the submenu opens, may return new children (same as update()'s argument)
+        self.provider = provider
         self.key = key
         if template:
             self._icon = icon[int(_USE_DARK)]
         else:
             self._icon = icon
         self._state = 0
-        self.id = _unique_id()
+        self.id = None  # command id, only assigned while the item is part of the native menu
         self.child_dict = {}
+        # native menu state, see _sync_menu
+        self._parent = None
+        self._hmenu = None
+        self._rendered = []
+        self._native = None
+        self._materialized = False
+        self._hbitmap = 0
 
     def __repr__(self):
         return '<{}: [{}; callback: {}]>'.format(type(self).__name__,
                 repr(self.title), repr(self.callback))
 
+    @_on_ui_thread
     def __setitem__(self, key, value):
-        exists = key in self.child_dict
-        self.child_dict[key] = default
-        _app._update_menu()
+        if type(value) == str:
+            value = MenuItem(value)
+        elif value == separator:
+            value = SeparatorItem()
+        self.child_dict[key] = value
+        self._update_menu()
 
     def __getitem__(self, key):
         return self.child_dict[key]
 
+    @_on_ui_thread
     def __delitem__(self, key):
         c = self.child_dict[key]
         del self.child_dict[key]
-        _app._update_menu()
+        self._update_menu()
 
+    @_on_ui_thread
     def setdefault(self, key, default=None):
         'od.setdefault(k[,d]) -> od.get(k,d), also set od[k]=d if k not in od'
         if key in self.child_dict:
             return self.child_dict[key]
         self.child_dict[key] = default
-        _app._update_menu()
+        self._update_menu()
         return default
 
+    @_on_ui_thread
     def add(self, menuitem):
         if type(menuitem) == str:
             menuitem = MenuItem(menuitem)
@@ -273,16 +736,31 @@ class MenuItem(object):
             self.child_dict[menuitem] = menuitem
         else:
             self.child_dict[menuitem.title] = menuitem
-        _app._update_menu()
+        self._update_menu()
 
+    @_on_ui_thread
     def clear(self):
         self.child_dict = {}
-        _app._update_menu()
+        self._update_menu()
 
+    @_on_ui_thread
     def update(self, menu=[]):
-        self.child_dict = {}
-        self._append(menu)
-        _app._update_menu()
+        with _menu_batch():
+            self.child_dict = {}
+            self._append(menu)
+            self._update_menu()
+
+    def batch(self):
+        """Context manager (also usable as decorator) deferring native menu updates until the outermost batch exits.
+        Menu changes made in @clicked and @timer callbacks are batched automatically.
+
+        .. code-block:: python
+
+            with app.menu.batch():
+                for name in names:
+                    app.menu.add(name)
+        """
+        return _menu_batch()
 
     def keys(self):
         return list(self.child_dict.keys())
@@ -298,46 +776,45 @@ class MenuItem(object):
         return self._title
 
     @title.setter
+    @_on_ui_thread
     def title(self, value):
         self._title = value
-        if _app:
-            info = MENUITEMINFOW()
-            info.fMask = MIIM_STRING
-            info.dwTypeData = value
-            user32.SetMenuItemInfoW(_app.hmenu_popup, self.id, FALSE, byref(info))
+        self._update_menu()
 
     @property
     def icon(self):
         return self._icon
 
     @icon.setter
+    @_on_ui_thread
     def icon(self, value):
         self._icon = value
-        if _app:
-            info = MENUITEMINFOW()
-            info.fMask = MIIM_BITMAP
-            info.hbmpItem = user32.LoadImageW(0, value, IMAGE_BITMAP, _MENU_ICON_SIZE, _MENU_ICON_SIZE, LR_LOADFROMFILE)
-            user32.SetMenuItemInfoW(_app.hmenu_popup, self.id, FALSE, byref(info))
+        self._update_menu()
 
     @property
     def state(self):
         return self._state
 
     @state.setter
+    @_on_ui_thread
     def state(self, value):
         self._state = value
-        if _app:
-            user32.CheckMenuItem(_app.hmenu_popup, self.id, MF_BYCOMMAND | (MF_CHECKED if value else MF_UNCHECKED))
+        self._update_menu()
 
-    def set_callback(self, callback, key=None):
-        had_callback = self.callback is not None
+    @_on_ui_thread
+    def set_callback(self, callback, key=None, background=False, reentrancy='skip'):
+        _forget_callback(self.callback)
         self.callback = callback
-        has_callback = self.callback is not None
-        if _app and has_callback != had_callback:
-            info = MENUITEMINFOW()
-            info.fMask = MIIM_STATE
-            info.fState = (MFS_ENABLED if has_callback else MFS_GRAYED) | (MFS_CHECKED if self._state else MFS_UNCHECKED)
-            user32.SetMenuItemInfoW(_app.hmenu_popup, self.id, FALSE, byref(info))
+        self._runner = _BackgroundRunner(reentrancy) if background else None
+        if callback is not None:
+            _resolve_callback(callback)
+        self._update_menu()
+
+    def _update_menu(self):
+        if _menu_batch_depth:
+            _menu_batch_dirty[id(self)] = self
+        elif isinstance(_app, App):
+            _app._update_menu(self)
 
     def _append(self, m):
         if m is None:
@@ -360,18 +837,25 @@ class MenuItem(object):
 ########################################
 class App(MainWin):
 
-    def __init__(self, name, title=None, icon=None, template=None, menu=None, quit_button='Quit'):
+    def __init__(self, name, title=None, icon=None, template=None, menu=None, quit_button='Quit', lazy_menus=False,
+            profile=False):
         super().__init__(name)
+        # if True, timings of messages and callbacks are recorded, see profile_snapshot
+        self.profiling = profile
 
         global _app
         _app = self
+        _bound_callbacks.clear()
 
         self.name = name
         self._title = name if title is None else str(title)
 
         self.quit_button = quit_button
         self.hmenu_popup = None
-        self._command_message_map = {}
+        self._command_message_map = {}  # command id => MenuItem, exactly the items in the native menu
+        # if True, submenus are only filled when they are opened
+        self.lazy_menus = lazy_menus
+        self._submenus = {}  # HMENU => MenuItem
 
         self._icon = icon
         if icon is None:
@@ -400,10 +884,10 @@ class App(MainWin):
                 item_id = user32.TrackPopupMenuEx(self.hmenu_popup, TPM_LEFTBUTTON | TPM_RETURNCMD, pt.x, pt.y, self.hwnd, 0)
                 user32.PostMessageW(self.hwnd, WM_NULL, 0, 0)
 
-                if item_id in self._command_message_map:
-                    mi = self._command_message_map[item_id]
+                mi = self._command_message_map.get(item_id)
+                if mi is not None:
                     if mi.callback:
-                        _call_as_function_or_method(mi.callback, mi)
+                        _run_callback(mi.callback, mi._runner, mi)
 
             elif msg == NIN_BALLOONTIMEOUT or msg == NIN_BALLOONUSERCLICK:
                 self.trayicon.restore_tooltip()
@@ -412,6 +896,23 @@ class App(MainWin):
 
         self.register_message_callback(_MYWM_NOTIFYICON, _on_MYWM_NOTIFYICON)
 
+        ########################################
+        #
+        ########################################
+        def _on_WM_INITMENUPOPUP(hwnd, wparam, lparam):
+            menuitem = self._submenus.get(wparam)
+            if menuitem is None:
+                return
+            if menuitem.provider is not None:
+                children = _call_as_function_or_method(menuitem.provider, menuitem)
+                # a coroutine provider has to update the menu itself
+                if children is not None and not isinstance(children, asyncio.Task):
+                    menuitem.update(children)
+            _sync_menu(menuitem)
+            return 0
+
+        self.register_message_callback(WM_INITMENUPOPUP, _on_WM_INITMENUPOPUP)
+
         if _USE_DARK:
             self.apply_theme(True)
 
@@ -422,6 +923,7 @@ class App(MainWin):
         return self._icon
 
     @icon.setter
+    @_on_ui_thread
     def icon(self, value):
         self._icon = _DEFAULT_ICO_FILE if value is None else value
         hicon = user32.LoadImageW(0, self._icon, IMAGE_ICON, 48, 48, LR_LOADFROMFILE)
@@ -435,14 +937,20 @@ class App(MainWin):
         return self._menu
 
     @menu.setter
+    @_on_ui_thread
     def menu(self, iterable):
         self._menu.update(iterable)
 
+    def batch(self):
+        """Same as :meth:`MenuItem.batch`."""
+        return _menu_batch()
+
     @property
     def title(self):
         return self._title
 
     @title.setter
+    @_on_ui_thread
     def title(self, value):
         value = '' if value is None else str(value)
         self._title = value
@@ -459,6 +967,18 @@ class App(MainWin):
     #
     ########################################
     def run(self):
+        self._prepare_run()
+        super().run()
+
+    ########################################
+    # Like run, but the message loop is part of an asyncio event loop, so callbacks can be coroutines. If main is a
+    # coroutine, it's run as a task of that loop.
+    ########################################
+    def run_async(self, main=None):
+        self._prepare_run()
+        super().run_async(main)
+
+    def _prepare_run(self):
 
 #        setattr(App, '*app_instance', self)  # class level ref to running instance (for passing self to App subclasses)
 
@@ -477,26 +997,29 @@ class App(MainWin):
             self.quit_button.set_callback(self.quit)
             self._menu.add(self.quit_button)
 
-        # convert to winapp menu dict
-        menu_data = {"items": []}
-        for c in self._menu.values():
-             _make_menu_data(menu_data, c)
-
-        self.hmenu_popup = self.make_popup_menu(menu_data)
+        self.hmenu_popup = self._menu._hmenu = user32.CreatePopupMenu()
+        _sync_menu(self._menu)
 
-        super().run()
+    def start_watchdog(self, callback=None, threshold=0.25, report_interval=5.0):
+        """Starts a watchdog thread that reports when the UI thread doesn't handle messages for `threshold`
+        seconds, e.g. because a callback blocks. `callback(stalled_seconds, stack)` is called in the watchdog thread,
+        by default the stack of the UI thread is logged (see :func:`debug_mode`). A stall is reported only once,
+        and at most one report is made every `report_interval` seconds.
+        """
+        super().start_watchdog(_log_stall if callback is None else callback, threshold, report_interval)
 
     ########################################
-    #
+    # Only syncs the native menu of the given MenuItem (and of its subtree where it changed)
     ########################################
-    def _update_menu(self):
-        if self.hmenu_popup:
-            user32.DestroyMenu(self.hmenu_popup)
-        if len(self.menu.values()):
-            menu_data = {"items": []}
-            for c in self.menu.values():
-                 _make_menu_data(menu_data, c)
-            self.hmenu_popup = self.make_popup_menu(menu_data)
+    def _update_menu(self, menuitem=None):
+        if not self.hmenu_popup:
+            return
+        if menuitem is None:
+            menuitem = self._menu
+        if menuitem._parent is not None:
+            _sync_menu_item(menuitem)
+        if menuitem._materialized:
+            _sync_menu(menuitem)
 
 
 ########################################
@@ -514,6 +1037,8 @@ class Response(object):
 ########################################
 class Window(object):
 
+    _IDC_EDIT = 2
+
     def __init__(self, message='', title='', default_text='', ok=None, cancel=None, dimensions=(320, 160)):
         global _app
         if _app is None:
@@ -552,14 +1077,53 @@ class Window(object):
                     self.add_button(btn)
 
     def run(self):
-        IDC_EDIT = 2
+        self._dialog_dict = self._build_dialog_dict()
+
+        def _dialog_proc_callback(hwnd, msg, wparam, lparam):
+            if msg == WM_INITDIALOG:
+                self._set_default_text(hwnd)
+            elif msg == WM_COMMAND:
+                command = HIWORD(wparam)
+                if command == BN_CLICKED:
+                    control_id = LOWORD(wparam)
+                    self._result = self._get_text(hwnd)
+                    user32.EndDialog(hwnd, control_id)
+            elif msg == WM_CLOSE:
+                user32.EndDialog(hwnd, len(self._buttons) - 1)
+            return user32.DefWindowProcW(hwnd, msg, wparam, lparam)
+
+        self._dialog = Dialog(_app, self._dialog_dict, _dialog_proc_callback)
+
+        self._result = self._default_text
+        btn_id = _app.dialog_show_sync(self._dialog)
+        # The “ok” button will return 1 and the “cancel” button will return 0.
+        if btn_id < 2:
+            btn_id = 1 - btn_id
+        return Response(btn_id, self._result)
+
+    def run_async(self):
+        """Like :meth:`run`, but returns immediately instead of blocking until the window is closed. The returned
+        future resolves to the :class:`Response` and can be awaited in :meth:`App.run_async`. Cancelling it closes
+        the window. Can be called from any thread, several windows can be open at once.
+        """
+        def _get_result(hwnd, btn_id):
+            if btn_id < 2:
+                btn_id = 1 - btn_id
+            return Response(btn_id, self._get_text(hwnd) if hwnd else self._default_text)
+
+        def _build():
+            self._dialog_dict = self._build_dialog_dict()
+            return self._dialog_dict, _get_result, len(self._buttons) - 1, self._set_default_text
+        return _show_dialog_async(_build)
+
+    def _build_dialog_dict(self):
         margin = 7
         button_width, button_height, button_dist = 50, 12, 5
         dialog_width_min = 2 * margin + len(self._buttons) * button_width + (len(self._buttons) - 1) * button_dist
         dialog_width = max(self._dialog_width, dialog_width_min)
         dialog_height = 60
 
-        self._dialog_dict = {
+        dialog_dict = {
             "class": "DIALOGEX",
             "rect": [200, 200, dialog_width, dialog_height],
             "style": -2134376256,
@@ -575,7 +1139,7 @@ class Window(object):
                 },
                 {
                     "caption": "",
-                    "id": IDC_EDIT,
+                    "id": self._IDC_EDIT,
                     "class": "EDIT",
                     "style": WS_CHILD | WS_VISIBLE | WS_BORDER | ES_AUTOHSCROLL,
                     "rect": [margin, 18, dialog_width - 2 * margin, 12]
@@ -586,7 +1150,7 @@ class Window(object):
         x = dialog_width - margin - len(self._buttons) * button_width - (len(self._buttons) - 1) * button_dist
 
         for i, button_text in enumerate(self._buttons):
-            self._dialog_dict['controls'].append({
+            dialog_dict['controls'].append({
                 'id': i,
                 'class': 'BUTTON',
                 'caption': button_text,
@@ -595,31 +1159,17 @@ class Window(object):
             })
             x += button_width + button_dist
 
-        def _dialog_proc_callback(hwnd, msg, wparam, lparam):
-            if msg == WM_INITDIALOG:
-                if self._default_text:
-                    user32.SendDlgItemMessageW(hwnd, IDC_EDIT, WM_SETTEXT, 0, create_unicode_buffer(self._default_text))
-            elif msg == WM_COMMAND:
-                command = HIWORD(wparam)
-                if command == BN_CLICKED:
-                    control_id = LOWORD(wparam)
-                    text_len = user32.SendDlgItemMessageW(hwnd, IDC_EDIT, WM_GETTEXTLENGTH, 0, 0) + 1
-                    buf = create_unicode_buffer(text_len)
-                    user32.SendDlgItemMessageW(hwnd, IDC_EDIT, WM_GETTEXT, text_len, byref(buf))
-                    self._result = str(buf.value)
-                    user32.EndDialog(hwnd, control_id)
-            elif msg == WM_CLOSE:
-                user32.EndDialog(hwnd, len(self._buttons) - 1)
-            return user32.DefWindowProcW(hwnd, msg, wparam, lparam)
+        return dialog_dict
 
-        self._dialog = Dialog(_app, self._dialog_dict, _dialog_proc_callback)
+    def _set_default_text(self, hwnd):
+        if self._default_text:
+            user32.SendDlgItemMessageW(hwnd, self._IDC_EDIT, WM_SETTEXT, 0, create_unicode_buffer(self._default_text))
 
-        self._result = self._default_text
-        btn_id = _app.dialog_show_sync(self._dialog)
-        # The “ok” button will return 1 and the “cancel” button will return 0.
-        if btn_id < 2:
-            btn_id = 1 - btn_id
-        return Response(btn_id, self._result)
+    def _get_text(self, hwnd):
+        text_len = user32.SendDlgItemMessageW(hwnd, self._IDC_EDIT, WM_GETTEXTLENGTH, 0, 0) + 1
+        buf = create_unicode_buffer(text_len)
+        user32.SendDlgItemMessageW(hwnd, self._IDC_EDIT, WM_GETTEXT, text_len, byref(buf))
+        return str(buf.value)
 
 
 ########################################
@@ -627,10 +1177,24 @@ class Window(object):
 ########################################
 class Timer(object):
 
-    def __init__(self, callback, interval):
+    def __init__(self, callback, interval, background=False, reentrancy='skip', precise=False, missed='skip',
+            tolerance=0, pause_when_inactive=False):
+        if missed not in _MISSED_TICK_MODES:
+            raise ValueError('missed must be one of {}'.format(', '.join(_MISSED_TICK_MODES)))
         self.callback = callback
         self._interval = interval
         self._timer_id = None
+        # if background is True, the callback is run on a worker thread, see _BackgroundRunner
+        self._runner = _BackgroundRunner(reentrancy) if background else None
+        # if precise is True, the timer fires at fixed rate based on a high-resolution timer. Ticks that couldn't
+        # be delivered in time are skipped or all delivered late ('catchup'), `missed` is their number.
+        self.precise = precise
+        self.missed_mode = missed
+        self.missed = 0
+        # the timer may fire up to `tolerance` seconds late, so it can share a wakeup with other timers
+        self.tolerance = tolerance
+        # if True, the timer doesn't fire while the session is locked or the display is off
+        self.pause_when_inactive = pause_when_inactive
         _TIMERS.append(self)
 
     def __repr__(self):
@@ -655,18 +1219,37 @@ class Timer(object):
 
     def set_callback(self, callback):
         """Set the function that should be called every interval seconds. It will be passed this rumps.Timer object as its only parameter."""
+        _forget_callback(self.callback)
         self.callback = callback
         if self.is_alive():
             self.stop()
             self.start()
 
+    @_on_ui_thread
     def start(self):
         """Start the timer thread loop."""
         if _app is None:
             raise _NO_APP_ERROR
-        self._timer_id = _app.create_timer(lambda: _call_as_function_or_method(self.callback, self),
-                int(self._interval * 1000))
-
+        _resolve_callback(self.callback)
+        if self.precise:
+            self._timer_id = _app.create_precise_timer(self._on_ticks, self._interval * 1000)
+        else:
+            self._timer_id = _app.create_timer(lambda: _run_callback(self.callback, self._runner, self),
+                    int(self._interval * 1000), tolerance=int(self.tolerance * 1000),
+                    pausable=self.pause_when_inactive)
+
+    def _on_ticks(self, ticks):
+        self.missed = ticks - 1
+        for i in range(ticks if self.missed_mode == 'catchup' else 1):
+            if self._timer_id is None:  # stopped by the callback
+                break
+            # a failing tick doesn't drop the remaining ones
+            try:
+                _run_callback(self.callback, self._runner, self)
+            except Exception:
+                traceback.print_exc()
+
+    @_on_ui_thread
     def stop(self):
         """Stop the timer thread loop."""
         if self._timer_id:
@@ -674,9 +1257,123 @@ class Timer(object):
             self._timer_id = None
 
 
+########################################
+#
+########################################
+class Job(object):
+    """Calls `callback` (passing this Job) at wall clock times. Unlike :class:`Timer`, jobs follow changes of the
+    system time and wake up correctly after sleep. Jobs are listed by :func:`timers`.
+
+    :param at: a :class:`datetime.datetime` or timestamp for a single run, or a :class:`datetime.time` or
+               ``'HH:MM[:SS]'`` string for a daily run.
+    :param cron: a cron expression like ``'*/5 * * * *'`` (minute hour day-of-month month day-of-week) or an alias
+                 like ``'@hourly'``.
+    :param once: if True, the job only runs at the first matching time.
+    """
+
+    def __init__(self, callback, at=None, cron=None, once=False, background=False, reentrancy='skip'):
+        if (at is None) == (cron is None):
+            raise ValueError('either at or cron must be given')
+        if type(at) == str:
+            at = datetime.time.fromisoformat(at)
+        elif at is not None and not isinstance(at, (datetime.datetime, datetime.time, int, float)):
+            raise TypeError('at must be a datetime, time, timestamp or \'HH:MM\' string')
+        self.callback = callback
+        self.at = at
+        self.cron = CronExpression(cron) if cron is not None else None
+        self.once = once
+        self._timer_id = None
+        self._scheduled = False  # whether a run was scheduled since start(), for once
+        # if background is True, the callback is run on a worker thread, see _BackgroundRunner
+        self._runner = _BackgroundRunner(reentrancy) if background else None
+        _TIMERS.append(self)
+
+    def __repr__(self):
+        when = 'cron: {}'.format(repr(self.cron.expr)) if self.cron else 'at: {}'.format(self.at)
+        return '<{}: [callback: {}; {}; next run: {}]>'.format(type(self).__name__, repr(self.callback.__name__),
+                when, self.next_run)
+
+    @property
+    def next_run(self):
+        """The next time the job runs as local :class:`datetime.datetime`, or None if it isn't scheduled."""
+        deadline = _app.get_timer_deadline(self._timer_id) if self._timer_id is not None else None
+        return datetime.datetime.fromtimestamp(deadline) if deadline is not None else None
+
+    def is_alive(self):
+        """Whether the job is scheduled to run again."""
+        return self.next_run is not None
+
+    @_on_ui_thread
+    def start(self):
+        """Schedule the job."""
+        if _app is None:
+            raise _NO_APP_ERROR
+        self.stop()
+        _resolve_callback(self.callback)
+        self._scheduled = False
+        self._timer_id = _app.create_wallclock_timer(lambda: _run_callback(self.callback, self._runner, self),
+                self._next_run)
+
+    @_on_ui_thread
+    def stop(self):
+        """Cancel the job."""
+        if self._timer_id is not None:
+            _app.kill_timer(self._timer_id)
+            self._timer_id = None
+
+    # returns the first run time (timestamp) after the timestamp `after`
+    def _next_run(self, after):
+        if self.once and self._scheduled:
+            return None
+        if self.cron is not None:
+            dt = self.cron.next_after(datetime.datetime.fromtimestamp(after))
+            res = dt.timestamp() if dt is not None else None
+        elif isinstance(self.at, datetime.time):
+            dt = datetime.datetime.combine(datetime.date.fromtimestamp(after), self.at)
+            if dt.timestamp() <= after:
+                dt = datetime.datetime.combine(dt.date() + datetime.timedelta(days=1), self.at)
+            res = dt.timestamp()
+        else:
+            res = self.at.timestamp() if isinstance(self.at, datetime.datetime) else self.at
+            if self._scheduled or res <= after:
+                return None
+        self._scheduled = res is not None
+        return res
+
+
+########################################
+#
+########################################
+class Supervisor(ProcessSupervisor):
+    """Starts child processes and watches them with wait threads instead of polling. `on_exit(process)` and
+    `on_restart(process)` are called on the UI thread as soon as a process exits or was restarted.
+
+    .. code-block:: python
+
+        supervisor = ruwps.Supervisor(on_exit=lambda p: print(p.name, p.returncode, list(p.stderr)))
+        supervisor.start('tunnel', ['ssh', '-N', '-D', '1080', 'host'], restart=True, capture_output=True)
+
+    :param max_restarts: how often a process started with ``restart=True`` is restarted in a row.
+    :param backoff: delay before the first restart in seconds, doubled for each further one (up to `max_backoff`),
+                    randomized by +/- `jitter`.
+    :param stable_after: the restart count is reset once a process ran for this many seconds.
+    :param buffer_lines: number of stdout/stderr lines kept for processes started with ``capture_output=True``.
+    """
+
+    def _dispatch(self, func, *args):
+        if _app is None:
+            func(*args)
+        else:
+            _app.call_soon_threadsafe(func, *args)
+
+    def _call(self, callback, *args):
+        _call_as_function_or_method(callback, *args)
+
+
 # Decorators and helper function serving to register functions for dealing with interaction and events
 #- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-def timer(interval):
+def timer(interval, background=False, reentrancy='skip', precise=False, missed='skip', tolerance=0,
+        pause_when_inactive=False):
     """Decorator for registering a function as a callback in a new thread. The function will be repeatedly called every
     `interval` seconds. This decorator accomplishes the same thing as creating a :class:`rumps.Timer` object by using
     the decorated function and `interval` as parameters and starting it on application launch.
@@ -688,9 +1385,47 @@ def timer(interval):
             print 'hi'
 
     :param interval: a number representing the time in seconds before the decorated function should be called.
+    :param background: if True, the function is called on a worker thread, so it doesn't block the UI. Changes to the
+                       menu or app are passed to the UI thread.
+    :param reentrancy: what to do if the previous call is still running when the timer fires again: 'skip' (default),
+                       'queue' or 'cancel' (see :func:`is_cancelled`).
+    :param precise: if True, the function is called at a fixed rate based on a high-resolution timer, instead of
+                    WM_TIMER (~15.6 ms granularity, drifts under load).
+    :param missed: for precise timers, what to do with ticks that couldn't be delivered in time: 'skip' (default)
+                   or 'catchup' (call the function once for each). The Timer's `missed` attribute is their number.
+    :param tolerance: how many seconds the function may be called late. Timers whose tolerance windows overlap are
+                      fired together with a single wakeup, e.g. ``@rumps.timer(60, tolerance=5)``.
+    :param pause_when_inactive: if True, the function isn't called while the session is locked or the display is
+                                off. If it became due in the meantime, it's called once when the session is active.
+    """
+    def decorator(func):
+        t = Timer(func, interval, background, reentrancy, precise, missed, tolerance, pause_when_inactive)
+        return func
+    return decorator
+
+def schedule(at=None, cron=None, once=False, background=False, reentrancy='skip'):
+    """Decorator for registering a function as a :class:`Job` that is called at wall clock times, started on
+    application launch. Exactly one of `at` and `cron` has to be given.
+
+    .. code-block:: python
+
+        @rumps.schedule(cron='*/5 * * * *')
+        def every_five_minutes(sender):
+            print('hi')
+
+        @rumps.schedule(at='09:30', once=True)
+        def morning_reminder(sender):
+            rumps.notification('Reminder', None, 'Stand-up')
+
+    :param at: a :class:`datetime.datetime` or timestamp for a single run, or a :class:`datetime.time` or
+               ``'HH:MM[:SS]'`` string for a daily run.
+    :param cron: a cron expression (minute hour day-of-month month day-of-week), e.g. ``'0 9 * * mon-fri'``.
+    :param once: if True, the function is only called at the first matching time.
+    :param background: if True, the function is called on a worker thread, see :func:`timer`.
+    :param reentrancy: what to do if the previous call is still running, see :func:`timer`.
     """
     def decorator(func):
-        t = Timer(func, interval)
+        Job(func, at, cron, once, background, reentrancy)
         return func
     return decorator
 
@@ -710,6 +1445,10 @@ def clicked(*args, **options):
     :param args: a series of strings representing the path to a :class:`rumps.MenuItem` in the main menu of the
                  application.
     :param key: a string representing the key shortcut as an alternative means of clicking the menu item.
+    :param background: if True, the function is called on a worker thread, so it doesn't block the UI. Changes to the
+                       menu or app are passed to the UI thread.
+    :param reentrancy: what to do if the item is clicked again while the previous call is still running: 'skip'
+                       (default), 'queue' or 'cancel' (see :func:`is_cancelled`).
     """
 
     def decorator(func):
@@ -724,7 +1463,8 @@ def clicked(*args, **options):
                     mi = MenuItem(arg)
                     menuitem.add(mi)
                     menuitem = mi
-            menuitem.set_callback(func, options.get('key'))
+            menuitem.set_callback(func, options.get('key'), options.get('background', False),
+                    options.get('reentrancy', 'skip'))
         # delay registering the button until we have a current instance to be able to traverse the menu
         buttons = clicked.__dict__.setdefault('*buttons', [])
         buttons.append(register_click)
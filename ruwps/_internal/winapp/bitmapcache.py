@@ -0,0 +1,64 @@
+__all__ = ('BitmapCache',)
+
+import os
+from collections import OrderedDict
+
+from .const import IMAGE_BITMAP, LR_LOADFROMFILE
+from .dlls import gdi32, user32
+
+
+########################################
+# LRU cache of HBITMAPs loaded from .bmp files, keyed by (path, size, theme variant, file mtime).
+# Handles are reference counted, only unused ones are evicted (and deleted) when the cache exceeds max_size.
+########################################
+class BitmapCache(object):
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.__entries = OrderedDict()  # key => [hbitmap, refcount]
+        self.__keys = {}                # hbitmap => key
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def acquire(self, filename, size, is_dark=False):
+        try:
+            mtime = os.stat(filename).st_mtime_ns
+        except OSError:
+            mtime = None
+        key = (filename, size, bool(is_dark), mtime)
+        entry = self.__entries.get(key)
+        if entry is None:
+            hbitmap = user32.LoadImageW(0, filename, IMAGE_BITMAP, size, size, LR_LOADFROMFILE)
+            if not hbitmap:
+                return 0
+            entry = self.__entries[key] = [hbitmap, 0]
+            self.__keys[hbitmap] = key
+        else:
+            self.__entries.move_to_end(key)
+        entry[1] += 1
+        self.__evict()
+        return entry[0]
+
+    def release(self, hbitmap):
+        key = self.__keys.get(hbitmap)
+        if key is not None:
+            self.__entries[key][1] -= 1
+            self.__evict()
+
+    def clear(self):
+        for key in [k for k, e in self.__entries.items() if e[1] == 0]:
+            self.__delete(key)
+
+    def __evict(self):
+        if len(self.__entries) <= self.max_size:
+            return
+        for key in [k for k, e in self.__entries.items() if e[1] == 0]:
+            self.__delete(key)
+            if len(self.__entries) <= self.max_size:
+                break
+
+    def __delete(self, key):
+        hbitmap = self.__entries.pop(key)[0]
+        del self.__keys[hbitmap]
+        gdi32.DeleteObject(hbitmap)
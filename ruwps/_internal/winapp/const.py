@@ -37,6 +37,7 @@ CLIP_DEFAULT_PRECIS = 0
 COLOR_3DFACE = 15
 COLOR_WINDOW = 5
 COLOR_WINDOWTEXT = 8
+CREATE_WAITABLE_TIMER_HIGH_RESOLUTION = 2
 CS_HREDRAW = 2
 CS_VREDRAW = 1
 CW_USEDEFAULT = -2147483648
@@ -44,6 +45,7 @@ DC_BRUSH = 18
 DEFAULT_PITCH = 0
 DEFAULT_QUALITY = 0
 DELETE = 65536
+DEVICE_NOTIFY_WINDOW_HANDLE = 0
 DS_CENTER = 2048
 DS_NOIDLEMSG = 256
 DS_SETFONT = 64
@@ -66,10 +68,13 @@ FCONTROL = 8
 FF_DONTCARE = 0
 FSHIFT = 4
 FW_DONTCARE = 0
+GA_ROOT = 2
 GCL_HBRBACKGROUND = -10
 GWL_EXSTYLE = -20
 GWL_STYLE = -16
 GWL_WNDPROC = -4
+GW_CHILD = 5
+GW_HWNDNEXT = 2
 HKEY_CURRENT_USER = -2147483647
 HWND_NOTOPMOST = -2
 HWND_TOP = 0
@@ -88,13 +93,16 @@ IDI_INFORMATION = IDI_ASTERISK
 IDOK = 1
 IMAGE_BITMAP = 0
 IMAGE_ICON = 1
+INFINITE = 4294967295
 LF_FACESIZE = 32
 LOGPIXELSX = 88
 LOGPIXELSY = 90
 LR_LOADFROMFILE = 16
 LWA_ALPHA = 2
+MAXIMUM_WAIT_OBJECTS = 64
 MAX_PATH = 260
 MF_BYCOMMAND = 0
+MF_BYPOSITION = 1024
 MF_CHECKED = 8
 MF_ENABLED = 0
 MF_GRAYED = 1
@@ -106,15 +114,26 @@ MFS_CHECKED = MF_CHECKED
 MFS_ENABLED = MF_ENABLED
 MFS_GRAYED = 3
 MFS_UNCHECKED = MF_UNCHECKED
+MFT_SEPARATOR = 2048
+MFT_STRING = 0
 MIIM_BITMAP = 128
+MIIM_FTYPE = 256
+MIIM_ID = 2
 MIIM_STATE = 1
 MIIM_STRING = 64
+MIIM_SUBMENU = 4
+MWMO_INPUTAVAILABLE = 4
+NOTIFY_FOR_THIS_SESSION = 0
 NULL = 0
 OBJID_MENU = -3
 ODS_HOTLIGHT = 64
 ODS_SELECTED = 1
 OUT_TT_PRECIS = 4
+PBT_APMRESUMEAUTOMATIC = 18
+PBT_POWERSETTINGCHANGE = 32787
+PM_REMOVE = 1
 PS_INSIDEFRAME = 6
+QS_ALLINPUT = 1279
 RDW_ALLCHILDREN = 128
 RDW_ERASE = 4
 RDW_FRAME = 1024
@@ -128,6 +147,8 @@ SWP_NOMOVE = 2
 SWP_NOSIZE = 1
 SWP_NOZORDER = 4
 SW_SHOW = 5
+SYNCHRONIZE = 1048576
+TIMER_ALL_ACCESS = 2031619
 TPM_LEFTBUTTON = 0
 TPM_RETURNCMD = 256
 TRANSPARENT = 1
@@ -135,12 +156,16 @@ TRUE = 1
 UISF_HIDEFOCUS = 1
 UIS_CLEAR = 2
 UIS_SET = 1
+USER_TIMER_MAXIMUM = 2147483647
+USER_TIMER_MINIMUM = 10
 VK_DELETE = 46
 VK_LEFT = 37
 VK_OEM_MINUS = 189
 VK_OEM_PLUS = 187
 VK_RETURN = 13
 VK_RIGHT = 39
+WAIT_FAILED = 4294967295
+WAIT_OBJECT_0 = 0
 WC_BUTTON = "Button"
 WC_STATIC = "Static"
 WM_CHANGEUISTATE = 295
@@ -150,20 +175,32 @@ WM_CTLCOLORBTN = 309
 WM_CTLCOLORDLG = 310
 WM_CTLCOLOREDIT = 307
 WM_CTLCOLORLISTBOX = 308
+WM_CTLCOLORMSGBOX = 306
+WM_CTLCOLORSCROLLBAR = 311
 WM_CTLCOLORSTATIC = 312
+WM_DPICHANGED = 736
+WM_ENTERIDLE = 289
 WM_GETFONT = 49
 WM_GETTEXT = 13
 WM_GETTEXTLENGTH = 14
 WM_INITDIALOG = 272
+WM_INITMENUPOPUP = 279
 WM_NCACTIVATE = 134
+WM_NCDESTROY = 130
 WM_NCPAINT = 133
+WM_NOTIFY = 78
 WM_NULL = 0
+WM_POWERBROADCAST = 536
+WM_QUIT = 18
 WM_RBUTTONUP = 517
 WM_SETFONT = 48
 WM_SETTEXT = 12
+WM_SETTINGCHANGE = 26
 WM_THEMECHANGED = 794
+WM_TIMECHANGE = 30
 WM_TIMER = 275
 WM_USER = 1024
+WM_WTSSESSION_CHANGE = 689
 WS_BORDER = 8388608
 WS_CAPTION = 12582912
 WS_CHILD = 1073741824
@@ -177,3 +214,5 @@ WS_OVERLAPPEDWINDOW = 13565952
 WS_SYSMENU = 524288
 WS_TABSTOP = 65536
 WS_VISIBLE = 268435456
+WTS_SESSION_LOCK = 7
+WTS_SESSION_UNLOCK = 8
@@ -102,9 +102,9 @@ class Button(Window):
     def destroy_window(self):
         if self.is_dark:
             if self.__is_checkbox_or_radio:
-                self.parent_window.unregister_message_callback(WM_CTLCOLORSTATIC, self._on_WM_CTLCOLORSTATIC)
+                self.parent_window.unregister_child_message_callback(WM_CTLCOLORSTATIC, hwnd=self.hwnd)
             else:
-                self.parent_window.unregister_message_callback(WM_CTLCOLORBTN, self._on_WM_CTLCOLORBTN)
+                self.parent_window.unregister_child_message_callback(WM_CTLCOLORBTN, hwnd=self.hwnd)
         super().destroy_window()
 
     ########################################
@@ -124,29 +124,27 @@ class Button(Window):
         uxtheme.SetWindowTheme(self.hwnd, 'DarkMode_Explorer' if is_dark else 'Explorer', None)
         if self.__is_checkbox_or_radio:
             if is_dark:
-                self.parent_window.register_message_callback(WM_CTLCOLORSTATIC, self._on_WM_CTLCOLORSTATIC)
+                self.parent_window.register_child_message_callback(WM_CTLCOLORSTATIC, self._on_WM_CTLCOLORSTATIC, hwnd=self.hwnd)
             else:
-                self.parent_window.unregister_message_callback(WM_CTLCOLORSTATIC, self._on_WM_CTLCOLORSTATIC)
+                self.parent_window.unregister_child_message_callback(WM_CTLCOLORSTATIC, hwnd=self.hwnd)
         else:
             if is_dark:
-                self.parent_window.register_message_callback(WM_CTLCOLORBTN, self._on_WM_CTLCOLORBTN)
+                self.parent_window.register_child_message_callback(WM_CTLCOLORBTN, self._on_WM_CTLCOLORBTN, hwnd=self.hwnd)
             else:
-                self.parent_window.unregister_message_callback(WM_CTLCOLORBTN, self._on_WM_CTLCOLORBTN)
+                self.parent_window.unregister_child_message_callback(WM_CTLCOLORBTN, hwnd=self.hwnd)
 
     ########################################
     #
     ########################################
     def _on_WM_CTLCOLORBTN(self, hwnd, wparam, lparam):
-        if lparam == self.hwnd:
-            gdi32.SetDCBrushColor(wparam, BG_COLOR_DARK)
-            return gdi32.GetStockObject(DC_BRUSH)
+        gdi32.SetDCBrushColor(wparam, BG_COLOR_DARK)
+        return gdi32.GetStockObject(DC_BRUSH)
 
     ########################################
     #
     ########################################
     def _on_WM_CTLCOLORSTATIC(self, hwnd, wparam, lparam):
-        if lparam == self.hwnd:
-            #gdi32.SetBkMode(wparam, TRANSPARENT)
-#            gdi32.SetBkColor(wparam, BG_COLOR_DARK) # if self.is_dark else user32.GetSysColor(COLOR_3DFACE))
-            #gdi32.SetTextColor(wparam, TEXT_COLOR_DARK) # if self.is_dark else COLOR_WINDOWTEXT)
-            return BG_BRUSH_DARK  #gdi32.GetStockObject(DC_BRUSH)
+        #gdi32.SetBkMode(wparam, TRANSPARENT)
+#        gdi32.SetBkColor(wparam, BG_COLOR_DARK) # if self.is_dark else user32.GetSysColor(COLOR_3DFACE))
+        #gdi32.SetTextColor(wparam, TEXT_COLOR_DARK) # if self.is_dark else COLOR_WINDOWTEXT)
+        return BG_BRUSH_DARK  #gdi32.GetStockObject(DC_BRUSH)
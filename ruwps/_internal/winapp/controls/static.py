@@ -42,18 +42,17 @@ class Static(Window):
     ########################################
     def destroy_window(self):
         if self.is_dark:
-            self.parent_window.unregister_message_callback(WM_CTLCOLORSTATIC, self._on_WM_CTLCOLORSTATIC)
+            self.parent_window.unregister_child_message_callback(WM_CTLCOLORSTATIC, hwnd=self.hwnd)
         super().destroy_window()
 
     ########################################
     #
     ########################################
     def _on_WM_CTLCOLORSTATIC(self, hwnd, wparam, lparam):
-        if lparam == self.hwnd:
-            gdi32.SetTextColor(wparam, TEXT_COLOR_DARK)
-            gdi32.SetBkColor(wparam, BG_COLOR_DARK)
-            gdi32.SetDCBrushColor(wparam, BG_COLOR_DARK)
-            return gdi32.GetStockObject(DC_BRUSH)
+        gdi32.SetTextColor(wparam, TEXT_COLOR_DARK)
+        gdi32.SetBkColor(wparam, BG_COLOR_DARK)
+        gdi32.SetDCBrushColor(wparam, BG_COLOR_DARK)
+        return gdi32.GetStockObject(DC_BRUSH)
 
     ########################################
     #
@@ -73,7 +72,7 @@ class Static(Window):
     def apply_theme(self, is_dark):
         self.is_dark = is_dark
         if is_dark:
-            self.parent_window.register_message_callback(WM_CTLCOLORSTATIC, self._on_WM_CTLCOLORSTATIC)
+            self.parent_window.register_child_message_callback(WM_CTLCOLORSTATIC, self._on_WM_CTLCOLORSTATIC, hwnd=self.hwnd)
         else:
-            self.parent_window.unregister_message_callback(WM_CTLCOLORSTATIC, self._on_WM_CTLCOLORSTATIC)
+            self.parent_window.unregister_child_message_callback(WM_CTLCOLORSTATIC, hwnd=self.hwnd)
         self.force_redraw_window()  # triggers WM_CTLCOLORSTATIC
@@ -0,0 +1,109 @@
+__all__ = ('CronExpression',)
+
+import datetime
+
+
+_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+_MONTH_NAMES = {name: i + 1 for i, name in enumerate(
+        ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'))}
+_DAY_NAMES = {name: i for i, name in enumerate(('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'))}
+
+# (name, min, max, names)
+_FIELDS = (
+    ('minute', 0, 59, {}),
+    ('hour', 0, 23, {}),
+    ('day of month', 1, 31, {}),
+    ('month', 1, 12, _MONTH_NAMES),
+    ('day of week', 0, 7, _DAY_NAMES),
+)
+
+# no match within this many years means the expression never matches (e.g. '0 0 30 2 *')
+_MAX_YEARS = 8
+
+
+def _parse_field(text, field):
+    name, lo, hi, names = field
+
+    def value(s):
+        v = names.get(s.lower()) if names else None
+        if v is None:
+            try:
+                v = int(s)
+            except ValueError:
+                raise ValueError('invalid {} in cron expression: {}'.format(name, repr(text))) from None
+        if not lo <= v <= hi:
+            raise ValueError('{} out of range in cron expression: {}'.format(name, repr(text)))
+        return v
+
+    values = set()
+    for part in text.split(','):
+        part, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if step < 1:
+            raise ValueError('invalid step in cron expression: {}'.format(repr(text)))
+        if part == '*':
+            first, last = lo, hi
+        elif '-' in part:
+            first, last = map(value, part.split('-', 1))
+        else:
+            first = value(part)
+            last = hi if step > 1 else first
+        values.update(range(first, last + 1, step))
+    return values
+
+
+########################################
+# Standard 5 field cron expression (minute hour day-of-month month day-of-week) with lists, ranges, steps, month
+# and day names and the @daily style aliases. As in cron, if both day fields are restricted, a day matches if
+# either of them does. Times are naive local datetimes.
+########################################
+class CronExpression(object):
+
+    def __init__(self, expr):
+        self.expr = expr
+        fields = _ALIASES.get(expr.strip().lower(), expr).split()
+        if len(fields) != 5:
+            raise ValueError('cron expression needs 5 fields: {}'.format(repr(expr)))
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+                _parse_field(text, field) for text, field in zip(fields, _FIELDS))
+        if 7 in weekdays:
+            weekdays = (weekdays - {7}) | {0}
+        self.weekdays = weekdays
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def __repr__(self):
+        return '<{}: {}>'.format(type(self).__name__, repr(self.expr))
+
+    def _day_matches(self, dt):
+        in_days = dt.day in self.days
+        in_weekdays = (dt.isoweekday() % 7) in self.weekdays
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    # Returns the first matching time after `dt` (a naive local datetime), or None if there is none
+    def next_after(self, dt):
+        dt = dt.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        end_year = dt.year + _MAX_YEARS
+        while dt.year <= end_year:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + datetime.timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += datetime.timedelta(minutes=1)
+            else:
+                return dt
+        return None
@@ -1,14 +1,17 @@
 __all__ = ('Dialog',)
 
+from collections import OrderedDict
 from ctypes import (Structure, create_unicode_buffer, c_voidp, windll, cast, byref, sizeof,
-        c_wchar_p, c_ubyte, POINTER)
+        c_wchar_p, c_ubyte, POINTER, WinError)
 from ctypes.wintypes import (SHORT, WORD, DWORD, HWND, HINSTANCE, LPWSTR, LPCWSTR, LPVOID,
         HANDLE, INT, WCHAR, BYTE, COLORREF, HDC, UINT, WPARAM, LPARAM, LONG, HGLOBAL)
 
-from .wintypes_extended import WINFUNCTYPE, UINT_PTR
+from .wintypes_extended import WINFUNCTYPE, UINT_PTR, WNDPROC
 from .dlls import shell32, gdi32
 from .const import *
 from .window import Window
+from .profiler import PROFILER
+from .textmetrics import TEXT_MEASURER
 from .themes import *
 from .controls.button import *
 from .controls.static import *
@@ -65,6 +68,29 @@ class DLGITEMTEMPLATEEX_PARTIAL(Structure):
         ('windowClass', DWORD), # array of 2 WORDs
     )
 
+########################################
+# All dialogs share a single dialog procedure thunk, which looks up the Dialog by HWND. A new dialog is bound to
+# its HWND with the first message it receives while it's being created.
+########################################
+_dialogs = {}           # hwnd => Dialog
+_creating_dialogs = []
+
+def _dialog_proc(hwnd, msg, wparam, lparam):
+    dialog = _dialogs.get(hwnd)
+    if dialog is None:
+        if not _creating_dialogs:
+            return FALSE
+        dialog = _dialogs[hwnd] = _creating_dialogs.pop()
+    if PROFILER.enabled:
+        res = PROFILER.call('dialog_message', msg, dialog._dialog_proc, hwnd, msg, wparam, lparam)
+    else:
+        res = dialog._dialog_proc(hwnd, msg, wparam, lparam)
+    if msg == WM_NCDESTROY:
+        del _dialogs[hwnd]
+    return res
+
+SHARED_DLGPROC = WNDPROC(_dialog_proc)
+
 # modern icon (flat)
 def get_stock_icon(siid):
     sii = SHSTOCKICONINFO()
@@ -72,17 +98,25 @@ def get_stock_icon(siid):
     shell32.SHGetStockIconInfo(siid, SHGSI_ICON, byref(sii))
     return sii.hIcon
 
+def _encode_sz(text):
+    return text.encode('utf-16-le') + b'\x00\x00'
+
+def _pad_dword(data):
+    if len(data) % 4:
+        data += bytes(4 - len(data) % 4)
+
 class DialogTemplate(object):
 
     def __init__(self):
         self.__num_controls = 0
         self.__control_id_counter = 1000
-        self.__dialog_item_data = b''
+        self.__dialog_item_data = bytearray()
 
     def add_control(self, control_class, text, x, y, w, h, control_id=-1, style=WS_CHILD | WS_VISIBLE, exstyle=0):
         self.__control_id_counter +=1
         self.__num_controls += 1
-        dlg_item_data = DLGITEMTEMPLATEEX_PARTIAL(
+        data = self.__dialog_item_data
+        data += DLGITEMTEMPLATEEX_PARTIAL(
                 0,
                 exstyle,
                 style,
@@ -91,15 +125,12 @@ class DialogTemplate(object):
                 control_id,
                 (control_class << 16) | 0xffff
                 )
-        dlg_item_data = bytes(dlg_item_data)
         if type(text) == int:
-            dlg_item_data += bytes(MAKEINTRESOURCEW(text))
+            data += bytes(WORD(0xffff)) + bytes(WORD(text))  # resource ordinal
         else:
-            dlg_item_data += bytes(create_unicode_buffer(text))
-        dlg_item_data += bytes(WORD(0))
-        if len(dlg_item_data) % 4:
-            dlg_item_data += b'\x00' * (4 - len(dlg_item_data) % 4)
-        self.__dialog_item_data += bytes(dlg_item_data)
+            data += _encode_sz(text)
+        data += bytes(WORD(0))  # no creation data
+        _pad_dword(data)
         return control_id
 
     def create(self, x, y, w, h, dialog_title='', font='MS Shell Dlg', font_height=8, show_icon=False,
@@ -110,7 +141,7 @@ class DialogTemplate(object):
         if not show_icon:
             exstyle |= WS_EX_DLGMODALFRAME
         # https://learn.microsoft.com/en-us/windows/win32/dlgbox/dlgtemplateex
-        dlg_data = DLGTEMPLATEEX_PARTIAL(
+        dlg_data = bytearray(DLGTEMPLATEEX_PARTIAL(
                 1,
                 0xffff,
                 0,
@@ -119,19 +150,110 @@ class DialogTemplate(object):
                 self.__num_controls,
                 x, y, w, h,
                 0,
-                )
-        dlg_data = bytes(dlg_data)
+                ))
         dlg_data += bytes(WORD(0))
-        dlg_data += bytes(create_unicode_buffer(dialog_title))
+        dlg_data += _encode_sz(dialog_title)
         dlg_data += bytes(WORD(font_height))
         dlg_data += bytes(WORD(400)) # weight
         dlg_data += b'\x00'
         dlg_data += b'\x01'
-        dlg_data += bytes(create_unicode_buffer(font)) # 14
+        dlg_data += _encode_sz(font)
+
+        _pad_dword(dlg_data)
+        dlg_data += self.__dialog_item_data
+        return dlg_data
+
+
+########################################
+# Binary dialog templates compiled from dialog dicts, cached by layout and strings, so showing the same alert or
+# Window again doesn't rebuild it. The template is returned as ctypes array sharing the bytearray's memory, which
+# can be passed to DialogBoxIndirectParamW/CreateDialogIndirectParamW without copying, together with a table of
+# the controls: (control_id, class, style, caption, index), class as BUTTON etc. index is the position in the
+# template if the id isn't unique (like -1 for labels), otherwise None.
+########################################
+_CONTROL_CLASSES = {
+    'BUTTON': BUTTON,
+    'EDIT': EDIT,
+    'STATIC': STATIC,
+    'LISTBOX': LISTBOX,
+    'SCROLLBAR': SCROLLBAR,
+    'COMBOBOX': COMBOBOX,
+}
+
+_TEMPLATE_CACHE_SIZE = 64
+_template_cache = OrderedDict()  # key => (c_ubyte array, controls)
+
+def _control_class(name):
+    if type(name) == int:
+        return name
+    try:
+        return _CONTROL_CLASSES[name.upper()]
+    except KeyError:
+        raise ValueError('unsupported dialog control class: {}'.format(repr(name))) from None
+
+def compile_dialog_template(dialog_dict):
+    key = (
+            tuple(dialog_dict['rect']), dialog_dict['caption'], tuple(dialog_dict['font']), dialog_dict['style'],
+            dialog_dict.get('exstyle', 0),
+            tuple((control['class'], control['caption'], tuple(control['rect']), control['id'], control['style'])
+                    for control in dialog_dict['controls'])
+            )
+    res = _template_cache.get(key)
+    if res is not None:
+        _template_cache.move_to_end(key)
+        return res
 
-        if len(dlg_data) % 4:
-            dlg_data += b'\x00' * (4 - len(dlg_data) % 4)
-        return dlg_data + self.__dialog_item_data
+    dialog = DialogTemplate()
+    controls = []
+    for i, control in enumerate(dialog_dict['controls']):
+        control_class = _control_class(control['class'])
+        dialog.add_control(
+                control_class,
+                control['caption'],
+                *control['rect'],
+                control_id=control['id'],
+                style=control['style'],
+                )
+        controls.append((control['id'], control_class, control['style'], control['caption'], i))
+    ids = [control[0] for control in controls]
+    controls = tuple(control[:4] + (control[4] if ids.count(control[0]) > 1 else None,) for control in controls)
+    data = dialog.create(
+            *dialog_dict['rect'],
+            dialog_dict['caption'],
+            *dialog_dict['font'],
+            False,
+            style=dialog_dict['style'],
+            exstyle=dialog_dict.get('exstyle', 0)
+            )
+    res = _template_cache[key] = ((c_ubyte * len(data)).from_buffer(data), controls)
+    if len(_template_cache) > _TEMPLATE_CACHE_SIZE:
+        _template_cache.popitem(last=False)
+    return res
+
+
+########################################
+# Label drawn over the caption of a checkbox or radio button, whose own text can't be colored. Unlike Static, it
+# handles WM_CTLCOLORSTATIC in both themes, following the theme of the dialog.
+########################################
+class _CheckboxLabel(Static):
+
+    def __init__(self, dialog, **kwargs):
+        self.dialog = dialog
+        super().__init__(**kwargs)
+        self.parent_window.register_child_message_callback(WM_CTLCOLORSTATIC, self._on_WM_CTLCOLORSTATIC, hwnd=self.hwnd)
+
+    def destroy_window(self):
+        self.parent_window.unregister_child_message_callback(WM_CTLCOLORSTATIC, hwnd=self.hwnd)
+        super().destroy_window()
+
+    def _on_WM_CTLCOLORSTATIC(self, hwnd, wparam, lparam):
+        gdi32.SetTextColor(wparam, TEXT_COLOR_DARK if self.dialog.is_dark else COLOR_WINDOWTEXT)
+        gdi32.SetBkColor(wparam, BG_COLOR_DARK if self.dialog.is_dark else user32.GetSysColor(COLOR_3DFACE))
+        return gdi32.GetStockObject(DC_BRUSH)
+
+    # the handler is registered for both themes
+    def apply_theme(self, is_dark):
+        self.is_dark = is_dark
 
 
 class Dialog(Window):
@@ -140,131 +262,94 @@ class Dialog(Window):
 
         super().__init__(DIALOG_CLASS, parent_window=parent_window, wrap_hwnd=0)
 
-        dialog = DialogTemplate()
-        for control in dialog_dict['controls']:
-            dialog.add_control(
-                    eval(control['class']),
-                    control['caption'],
-                    *control['rect'],
-                    control_id=control['id'],
-                    style=control['style'],
-                    )
-        dialog_data = dialog.create(
-                *dialog_dict['rect'],
-                dialog_dict['caption'],
-                *dialog_dict['font'],
-                False,
-                style=dialog_dict['style'],
-                exstyle=dialog_dict['exstyle'] if 'exstyle' in dialog_dict else 0
-                )
-
-        self.__dialog_data = (c_ubyte * len(dialog_data))(*dialog_data)
+        self.__dialog_data, self.__template_controls = compile_dialog_template(dialog_dict)
+        self.controls = []  # (hwnd, class, style, caption) of the template's controls, see _resolve_controls
 
         def _dialog_proc_callback(hwnd, msg, wparam, lparam):
 
             if msg == WM_CLOSE:
                 if self.__is_async:
+                    self.parent_window._dialog_remove(self)
                     user32.DestroyWindow(self.hwnd)
                     self.hwnd = None
                     self.children = []
                     self.controls = []
-                    self.parent_window._dialog_remove(self)
                 else:
                     user32.EndDialog(hwnd, 0)
 
+            elif msg == WM_NCDESTROY:
+                self.release_fonts()
+
             elif msg == WM_INITDIALOG:
                 self.hwnd = hwnd
                 dwm_use_dark_mode(hwnd, self.is_dark)
                 hfont = user32.SendMessageW(hwnd, WM_GETFONT, 0, 0)
-                self.controls = self.get_children()
-                for hwnd_control in self.controls:
-                    buf = create_unicode_buffer(32)
-                    user32.GetClassNameW(hwnd_control, buf, 32)
-                    window_class = buf.value
+                self.controls = self._resolve_controls()
+                for hwnd_control, control_class, style, caption in self.controls:
 
-                    if window_class == 'Button':
+                    if control_class == BUTTON:
                         uxtheme.SetWindowTheme(hwnd_control, 'DarkMode_Explorer' if self.is_dark else 'Explorer', None)
 
-                        style = user32.GetWindowLongPtrA(hwnd_control, GWL_STYLE)
-
                         if style & BS_TYPEMASK == BS_AUTOCHECKBOX or style & BS_TYPEMASK == BS_AUTORADIOBUTTON:
-                            rc = RECT()
-                            user32.GetClientRect(hwnd_control, byref(rc))
-
-                            buf = create_unicode_buffer(64)
-                            user32.GetWindowTextW(hwnd_control, buf, 64)
-                            window_title = buf.value.replace('&', '')
+                            window_title = caption.replace('&', '')
                             user32.SetWindowTextW(hwnd_control, window_title)
 
                             # wrap to prevent garbage collection while dialog exists
                             window_checkbox = Window('Button', parent_window=self, wrap_hwnd=hwnd_control)
 
                             rc_text = Dialog.calculate_text_rect(window_title, hfont=hfont)
-                            static = Static(parent_window=window_checkbox,
+                            static = _CheckboxLabel(self, parent_window=window_checkbox,
                                     style=WS_CHILD | SS_SIMPLE | WS_VISIBLE,
                                     left=16, top=3, width=rc_text.right, height=rc_text.bottom,
                                     window_title=window_title)
                             static.set_font(hfont=hfont)
 
-                            def _on_WM_CTLCOLORSTATIC(hwnd, wparam, lparam):
-                                gdi32.SetTextColor(wparam, TEXT_COLOR_DARK if self.is_dark else COLOR_WINDOWTEXT)
-                                gdi32.SetBkColor(wparam, BG_COLOR_DARK if self.is_dark else user32.GetSysColor(COLOR_3DFACE))
-                                return gdi32.GetStockObject(DC_BRUSH)
-                            window_checkbox.register_message_callback(WM_CTLCOLORSTATIC, _on_WM_CTLCOLORSTATIC)
-
                         elif style & BS_TYPEMASK == BS_GROUPBOX:
                             rc = RECT()
                             user32.GetWindowRect(hwnd_control, byref(rc))
                             user32.MapWindowPoints(None, hwnd, byref(rc), 2)
-                            buf = create_unicode_buffer(64)
-                            user32.GetWindowTextW(hwnd_control, buf, 64)
 
                             static = Static(parent_window=self,
                                     style=WS_CHILD | SS_SIMPLE | WS_VISIBLE,
                                     ex_style=WS_EX_TRANSPARENT,
                                     left=rc.left + 10, top=rc.top, width=rc.right - rc.left - 16, height=rc.bottom - rc.top,
-                                    window_title=buf.value)
+                                    window_title=caption)
                             static.set_font(hfont=hfont)
 
-                    elif window_class == 'Edit' and self.is_dark:
-                        # check parent
-                        user32.GetClassNameW(user32.GetParent(hwnd_control), buf, 32)
-                        if buf.value != 'ComboBox':
-                            user32.SetWindowLongPtrA(hwnd_control, GWL_EXSTYLE,
-                                    user32.GetWindowLongPtrA(hwnd_control, GWL_EXSTYLE) & ~WS_EX_CLIENTEDGE)
-                            user32.SetWindowLongPtrA(hwnd_control, GWL_STYLE,
-                                    user32.GetWindowLongPtrA(hwnd_control, GWL_STYLE) | WS_BORDER)
-
-                            rc = RECT()
-                            user32.GetWindowRect(hwnd_control, byref(rc))
-                            w, h = rc.right - rc.left, rc.bottom - rc.top
-                            user32.SendMessageW(hwnd_control, EM_SETMARGINS, EC_LEFTMARGIN, 2)
-                            user32.MapWindowPoints(None, user32.GetParent(hwnd_control), byref(rc), 1)
-                            user32.SetWindowPos(hwnd_control, 0, rc.left, rc.top + 1, w, h - 2, SWP_NOZORDER | SWP_FRAMECHANGED)
-
-                    elif window_class == 'ComboLBox' and self.is_dark:
-                        uxtheme.SetWindowTheme(hwnd_control, 'DarkMode_CFD', None)
-
+                    elif control_class == EDIT and self.is_dark:
                         user32.SetWindowLongPtrA(hwnd_control, GWL_EXSTYLE,
                                 user32.GetWindowLongPtrA(hwnd_control, GWL_EXSTYLE) & ~WS_EX_CLIENTEDGE)
                         user32.SetWindowLongPtrA(hwnd_control, GWL_STYLE,
                                 user32.GetWindowLongPtrA(hwnd_control, GWL_STYLE) | WS_BORDER)
-                        user32.SetWindowPos(hwnd_control, 0, 0, 0, 0, 0,
-                                SWP_NOMOVE | SWP_NOSIZE | SWP_NOZORDER | SWP_FRAMECHANGED)
 
-                    elif window_class == 'ComboBox' and self.is_dark:
+                        rc = RECT()
+                        user32.GetWindowRect(hwnd_control, byref(rc))
+                        w, h = rc.right - rc.left, rc.bottom - rc.top
+                        user32.SendMessageW(hwnd_control, EM_SETMARGINS, EC_LEFTMARGIN, 2)
+                        user32.MapWindowPoints(None, hwnd, byref(rc), 1)
+                        user32.SetWindowPos(hwnd_control, 0, rc.left, rc.top + 1, w, h - 2, SWP_NOZORDER | SWP_FRAMECHANGED)
+
+                    elif control_class == COMBOBOX and self.is_dark:
                         uxtheme.SetWindowTheme(hwnd_control, 'DarkMode_CFD', None)
 
+                        # the list of a CBS_SIMPLE combobox is a child window
+                        hwnd_list = user32.FindWindowExW(hwnd_control, None, 'ComboLBox', None)
+                        if hwnd_list:
+                            uxtheme.SetWindowTheme(hwnd_list, 'DarkMode_CFD', None)
+                            user32.SetWindowLongPtrA(hwnd_list, GWL_EXSTYLE,
+                                    user32.GetWindowLongPtrA(hwnd_list, GWL_EXSTYLE) & ~WS_EX_CLIENTEDGE)
+                            user32.SetWindowLongPtrA(hwnd_list, GWL_STYLE,
+                                    user32.GetWindowLongPtrA(hwnd_list, GWL_STYLE) | WS_BORDER)
+                            user32.SetWindowPos(hwnd_list, 0, 0, 0, 0, 0,
+                                    SWP_NOMOVE | SWP_NOSIZE | SWP_NOZORDER | SWP_FRAMECHANGED)
+
             elif msg == WM_THEMECHANGED:
                 dwm_use_dark_mode(hwnd, self.is_dark)
-                for hwnd_control in self.controls:
-                    buf = create_unicode_buffer(32)
-                    user32.GetClassNameW(hwnd_control, buf, 32)
-                    window_class = buf.value
-                    if window_class == 'Button':
+                for hwnd_control, control_class, style, caption in self.controls:
+                    if control_class == BUTTON:
                         uxtheme.SetWindowTheme(hwnd_control, 'DarkMode_Explorer' if self.is_dark else 'Explorer', None)
 
-                    elif window_class == 'Edit':
+                    elif control_class == EDIT:
                         rc = RECT()
                         user32.GetWindowRect(hwnd_control, byref(rc))
                         w, h = rc.right - rc.left, rc.bottom - rc.top
@@ -276,7 +361,7 @@ class Dialog(Window):
                                     user32.GetWindowLongPtrA(hwnd_control, GWL_STYLE) | WS_BORDER)
 
                             user32.SendMessageW(hwnd_control, EM_SETMARGINS, EC_LEFTMARGIN, 2)
-                            user32.MapWindowPoints(None, user32.GetParent(hwnd_control), byref(rc), 1)
+                            user32.MapWindowPoints(None, hwnd, byref(rc), 1)
                             user32.SetWindowPos(hwnd_control, 0, rc.left, rc.top + 1, w, h - 2, SWP_NOZORDER)  #, SWP_FRAMECHANGED)
                         else:
                             user32.SetWindowLongPtrA(hwnd_control, GWL_EXSTYLE,
@@ -285,7 +370,7 @@ class Dialog(Window):
                                     user32.GetWindowLongPtrA(hwnd_control, GWL_STYLE) & ~WS_BORDER)
 
                             user32.SendMessageW(hwnd_control, EM_SETMARGINS, EC_LEFTMARGIN, 0)
-                            user32.MapWindowPoints(None, user32.GetParent(hwnd_control), byref(rc), 1)
+                            user32.MapWindowPoints(None, hwnd, byref(rc), 1)
                             user32.SetWindowPos(hwnd_control, 0, rc.left, rc.top - 1, w, h + 2, SWP_NOZORDER)  #, SWP_FRAMECHANGED)
 
                 self.force_redraw_window()
@@ -308,34 +393,68 @@ class Dialog(Window):
 
             return dialog_proc_callback(hwnd, msg, wparam, lparam)
 
-        self.__dialogproc = WNDPROC(_dialog_proc_callback)
+        self._dialog_proc = _dialog_proc_callback
 
     def _show_async(self, is_dark=False):
         self.__is_async = True
         self.is_dark = self.parent_window.is_dark
-        self.hwnd = user32.CreateDialogIndirectParamW(
-                0,
-                byref(self.__dialog_data),
-                self.parent_window.hwnd,
-                self.__dialogproc,
-                1
-                )
+        _creating_dialogs.append(self)
+        try:
+            self.hwnd = user32.CreateDialogIndirectParamW(
+                    0,
+                    byref(self.__dialog_data),
+                    self.parent_window.hwnd,
+                    SHARED_DLGPROC,
+                    1
+                    )
+        finally:
+            if self in _creating_dialogs:
+                _creating_dialogs.remove(self)
+        if not self.hwnd:
+            raise WinError()
         user32.ShowWindow(self.hwnd, SW_SHOW)
 
     def _show_sync(self, is_dark=False, lparam=0):
         self.__is_async = False
         self.is_dark = self.parent_window.is_dark
-        res = user32.DialogBoxIndirectParamW(
-                0,
-                byref(self.__dialog_data),
-                self.parent_window.hwnd,
-                self.__dialogproc,
-                lparam
-                )
+        _creating_dialogs.append(self)
+        try:
+            res = user32.DialogBoxIndirectParamW(
+                    0,
+                    byref(self.__dialog_data),
+                    self.parent_window.hwnd,
+                    SHARED_DLGPROC,
+                    lparam
+                    )
+        finally:
+            if self in _creating_dialogs:
+                _creating_dialogs.remove(self)
         self.hwnd = None
         self.children = []
         return res
 
+    # Resolves the HWNDs of the template's controls that need theme fixups with GetDlgItem. Ids used by several
+    # controls are resolved by position instead, dialog controls are created in template order.
+    def _resolve_controls(self):
+        children = None
+        controls = []
+        for control_id, control_class, style, caption, index in self.__template_controls:
+            if control_class not in (BUTTON, EDIT, COMBOBOX):
+                continue
+            if index is None:
+                hwnd_control = user32.GetDlgItem(self.hwnd, control_id)
+            else:
+                if children is None:
+                    children = []
+                    hwnd_child = user32.GetWindow(self.hwnd, GW_CHILD)
+                    while hwnd_child:
+                        children.append(hwnd_child)
+                        hwnd_child = user32.GetWindow(hwnd_child, GW_HWNDNEXT)
+                hwnd_control = children[index] if index < len(children) else None
+            if hwnd_control:
+                controls.append((hwnd_control, control_class, style, caption))
+        return controls
+
     def apply_theme(self, is_dark):
         self.is_dark = is_dark
         if self.hwnd:
@@ -343,25 +462,10 @@ class Dialog(Window):
 
     @staticmethod
     def calculate_text_rect(text, font_name='MS Shell Dlg', font_size=8, hfont=None):
-        hdc = user32.GetDC(0)
-        if hfont is None:
-            hfont = gdi32.CreateFontW(font_size, 0, 0, 0, FW_DONTCARE, FALSE, FALSE, FALSE, ANSI_CHARSET, OUT_TT_PRECIS,
-                    CLIP_DEFAULT_PRECIS, DEFAULT_QUALITY, DEFAULT_PITCH | FF_DONTCARE, font_name)
-        gdi32.SelectObject(hdc, hfont)
-        rc = RECT(0, 0, 0, 0)
-        user32.DrawTextW(hdc, text, -1, byref(rc), DT_CALCRECT | DT_LEFT | DT_NOPREFIX)
-        user32.ReleaseDC(0, hdc)
-        return rc
+        cx, cy = TEXT_MEASURER.measure(text, 0, (font_name, font_size), hfont)
+        return RECT(0, 0, cx, cy)
 
     # logical coordinates, not pixels
     @staticmethod
     def calculate_multiline_text_height(text, text_width, font_name='MS Shell Dlg', font_size=8, hfont=None):
-        hdc = user32.GetDC(0)
-        if hfont is None:
-            hfont = gdi32.CreateFontW(font_size, 0, 0, 0, FW_DONTCARE, FALSE, FALSE, FALSE, ANSI_CHARSET, OUT_TT_PRECIS,
-                    CLIP_DEFAULT_PRECIS, DEFAULT_QUALITY, DEFAULT_PITCH | FF_DONTCARE, font_name)
-        gdi32.SelectObject(hdc, hfont)
-        rc = RECT(0, 0, text_width, 0)
-        user32.DrawTextW(hdc, text, -1, byref(rc), DT_CALCRECT | DT_LEFT | DT_TOP | DT_WORDBREAK | DT_NOPREFIX)
-        user32.ReleaseDC(0, hdc)
-        return rc.bottom
+        return TEXT_MEASURER.measure(text, text_width, (font_name, font_size), hfont)[1]
@@ -1,7 +1,7 @@
 from ctypes import windll, c_uint, POINTER, c_int, c_void_p, c_wchar_p, Structure
 from ctypes.wintypes import *
 
-from .wintypes_extended import WNDPROC, LONG_PTR, ENUMRESNAMEPROCW, ACCEL #, FONTENUMPROCW, LOGFONTW
+from .wintypes_extended import WNDPROC, LONG_PTR, UINT_PTR, ENUMRESNAMEPROCW, ACCEL #, FONTENUMPROCW, LOGFONTW
 
 advapi32 = windll.Advapi32
 #comctl32 = windll.Comctl32
@@ -13,6 +13,7 @@ shell32 = windll.shell32
 #shlwapi = windll.Shlwapi
 user32 = windll.user32
 uxtheme = windll.UxTheme
+wtsapi32 = windll.Wtsapi32
 
 ########################################
 # advapi32
@@ -146,6 +147,14 @@ gdi32.SetWindowExtEx.argtypes = (HDC, INT, INT, POINTER(SIZE))
 ########################################
 # kernel32
 ########################################
+kernel32.CloseHandle.argtypes = (HANDLE,)
+
+kernel32.CreateEventW.argtypes = (LPVOID, BOOL, BOOL, LPCWSTR)
+kernel32.CreateEventW.restype = HANDLE
+
+kernel32.CreateWaitableTimerExW.argtypes = (LPVOID, LPCWSTR, DWORD, DWORD)
+kernel32.CreateWaitableTimerExW.restype = HANDLE
+
 kernel32.EnumResourceNamesW.argtypes = (HMODULE, LPCWSTR, ENUMRESNAMEPROCW, LONG_PTR)
 kernel32.EnumResourceNamesW.restype = BOOL
 
@@ -177,8 +186,21 @@ kernel32.LoadResource.restype = HANDLE
 kernel32.LockResource.argtypes = (HANDLE, )
 kernel32.LockResource.restype = HANDLE
 
+kernel32.OpenProcess.argtypes = (DWORD, BOOL, DWORD)
+kernel32.OpenProcess.restype = HANDLE
+
+kernel32.ResetEvent.argtypes = (HANDLE,)
+
+kernel32.SetEvent.argtypes = (HANDLE,)
+
+kernel32.SetWaitableTimer.argtypes = (HANDLE, POINTER(LARGE_INTEGER), LONG, LPVOID, LPVOID, BOOL)
+kernel32.SetWaitableTimer.restype = BOOL
+
 kernel32.SizeofResource.argtypes = (HANDLE, HANDLE)
 
+kernel32.WaitForMultipleObjects.argtypes = (DWORD, POINTER(HANDLE), BOOL, DWORD)
+kernel32.WaitForMultipleObjects.restype = DWORD
+
 ########################################
 # shell32
 ########################################
@@ -231,10 +253,14 @@ user32.CreateIconFromResourceEx.restype = HICON
 
 user32.CreateIconIndirect.argtypes = (HANDLE, )  # POINTER(ICONINFO)
 
+user32.CreatePopupMenu.restype = HMENU
+
 user32.EnableWindow.argytpes = (HWND, BOOL)
 
 user32.DeleteMenu.argtypes = (HMENU, UINT, UINT)
 
+user32.DestroyMenu.argtypes = (HMENU,)
+
 user32.DestroyWindow.argytpes = (HWND,)
 
 user32.DrawEdge.argtypes = (HDC, POINTER(RECT), UINT, UINT)
@@ -252,6 +278,9 @@ user32.FindWindowExW.restype = HWND
 
 user32.FrameRect.argtypes = (HDC, POINTER(RECT), HBRUSH)
 
+user32.GetAncestor.argtypes = (HWND, UINT)
+user32.GetAncestor.restype = HWND
+
 user32.GetCapture.restype = HWND
 
 user32.GetCaretPos.argtypes = (POINTER(POINT),)
@@ -269,12 +298,18 @@ user32.GetDCEx.restype = HDC
 user32.GetDesktopWindow.restype = HANDLE
 user32.GetForegroundWindow.restype = HANDLE
 
+user32.GetDlgItem.argtypes = (HWND, INT)
+user32.GetDlgItem.restype = HWND
+
 user32.GetMenuBarInfo.argtypes = (HWND, LONG, LONG, LPVOID)  # PMENUBARINFO
 
 user32.GetMenuItemInfoW.argtypes = (HMENU, UINT, BOOL, LPVOID)  # LPMENUITEMINFOW
 
 user32.GetMenuStringW.argtypes = (HMENU, UINT, LPWSTR, INT, UINT)
 
+user32.GetQueueStatus.argtypes = (UINT,)
+user32.GetQueueStatus.restype = DWORD
+
 user32.GetWindow.argtypes = (HANDLE, UINT)
 
 user32.GetWindowLongPtrA.argtypes = (HWND, LONG_PTR)
@@ -294,6 +329,8 @@ user32.DefDlgProcW.argtypes = (HWND, c_uint, WPARAM, LPARAM)
 
 user32.DefWindowProcW.argtypes = (HWND, c_uint, WPARAM, LPARAM)
 
+user32.InsertMenuItemW.argtypes = (HMENU, UINT, BOOL, LPVOID)  # LPCMENUITEMINFOW
+
 user32.InvalidateRect.argtypes = (HWND, POINTER(RECT), BOOL)
 
 user32.InvertRect.argtypes = (HDC, POINTER(RECT))
@@ -315,22 +352,46 @@ user32.MapWindowPoints.argtypes = (HWND, HWND, LPVOID, UINT)
 
 user32.MB_GetString.restype = LPCWSTR
 
+user32.MsgWaitForMultipleObjectsEx.argtypes = (DWORD, POINTER(HANDLE), DWORD, DWORD, DWORD)
+user32.MsgWaitForMultipleObjectsEx.restype = DWORD
+
 user32.OffsetRect.argtypes = (POINTER(RECT), INT, INT)
 
 user32.OpenClipboard.argtypes = (HWND,)
 
+user32.PeekMessageW.argtypes = (POINTER(MSG), HWND, UINT, UINT, UINT)
+user32.PeekMessageW.restype = BOOL
+
 user32.PostMessageW.argtypes = (HWND, UINT, LPVOID, LPVOID)
 user32.PostMessageW.restype = LONG_PTR
 
+user32.RegisterPowerSettingNotification.argtypes = (HANDLE, LPVOID, DWORD)
+user32.RegisterPowerSettingNotification.restype = HANDLE
+
+user32.RegisterWindowMessageW.argtypes = (LPCWSTR,)
+user32.RegisterWindowMessageW.restype = UINT
+
 user32.ReleaseDC.argtypes = (HWND, HANDLE)
 
+user32.RemoveMenu.argtypes = (HMENU, UINT, UINT)
+
 user32.SetClassLongPtrW.argtypes = (HWND, INT, LONG_PTR)
 
 user32.SetClipboardData.argtypes = (UINT, HANDLE)
 user32.SetClipboardData.restype = HANDLE
 
+# Windows 8+
+try:
+    user32.SetCoalescableTimer.argtypes = (HWND, UINT_PTR, UINT, LPVOID, ULONG)
+    user32.SetCoalescableTimer.restype = UINT_PTR
+    HAS_COALESCABLE_TIMER = True
+except AttributeError:
+    HAS_COALESCABLE_TIMER = False
+
 user32.SetMenu.argtypes = (HWND, HMENU)
 
+user32.SetMenuItemInfoW.argtypes = (HMENU, UINT, BOOL, LPVOID)  # LPCMENUITEMINFOW
+
 # LPVOID to allow to send pointers
 user32.SendMessageW.argtypes = (HWND, UINT, LPVOID, LPVOID)
 user32.SendMessageW.restype = LONG_PTR
@@ -357,6 +418,9 @@ user32.TrackPopupMenuEx.argtypes = (HANDLE, UINT, INT, INT, HANDLE, c_void_p)
 
 user32.RegisterShellHookWindow.argtypes = (HWND,)
 
+user32.UnregisterPowerSettingNotification.argtypes = (HANDLE,)
+user32.UnregisterPowerSettingNotification.restype = BOOL
+
 ########################################
 # UxTheme
 ########################################
@@ -383,3 +447,12 @@ uxtheme.GetThemePartSize.argtypes = (HANDLE, HDC, INT, INT, POINTER(RECT), UINT,
 
 # https://learn.microsoft.com/en-us/windows/win32/api/uxtheme/nf-uxtheme-drawthemebackground
 uxtheme.DrawThemeBackground.argtypes = (HANDLE, HDC, INT, INT, POINTER(RECT), POINTER(RECT))  # HTHEME, HDC
+
+########################################
+# wtsapi32
+########################################
+wtsapi32.WTSRegisterSessionNotification.argtypes = (HWND, DWORD)
+wtsapi32.WTSRegisterSessionNotification.restype = BOOL
+
+wtsapi32.WTSUnRegisterSessionNotification.argtypes = (HWND,)
+wtsapi32.WTSUnRegisterSessionNotification.restype = BOOL
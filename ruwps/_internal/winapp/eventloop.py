@@ -0,0 +1,103 @@
+__all__ = ('MessagePumpEventLoop',)
+
+import math
+import threading
+from asyncio.windows_events import IocpProactor, ProactorEventLoop
+from ctypes import byref
+from ctypes.wintypes import HANDLE
+
+import _overlapped
+
+from .const import *
+from .dlls import kernel32, user32
+from .watchdog import WATCHDOG
+
+
+########################################
+# IocpProactor that waits with MsgWaitForMultipleObjectsEx, so window messages are handled while the loop is idle.
+#
+# A completion port can't be waited on directly, so a helper thread blocks in GetQueuedCompletionStatus. When it
+# dequeues a packet, it puts it back into the port, signals an event that wakes the loop thread and waits until
+# the loop thread has drained the port with the regular (non-blocking) IocpProactor._poll.
+########################################
+class MessagePumpProactor(IocpProactor):
+
+    def __init__(self, pump, idle=None, concurrency=INFINITE):
+        super().__init__(concurrency)
+        self._pump = pump
+        self._idle = idle
+        self._ready_event = kernel32.CreateEventW(None, True, False, None)
+        self._armed = threading.Event()
+        self._armed.set()
+        self._waiting = True
+        self._waiter = threading.Thread(target=self._wait_for_packets, name='ruwps-iocp-waiter', daemon=True)
+        self._waiter.start()
+
+    def _wait_for_packets(self):
+        while True:
+            self._armed.wait()
+            if not self._waiting:
+                break
+            status = _overlapped.GetQueuedCompletionStatus(self._iocp, INFINITE)
+            if not self._waiting:
+                break
+            if status is None:
+                continue
+            self._armed.clear()
+            err, transferred, key, address = status
+            _overlapped.PostQueuedCompletionStatus(self._iocp, transferred, key, address)
+            kernel32.SetEvent(self._ready_event)
+
+    def _poll(self, timeout=None):
+        if self._pump is None or not self._waiting:
+            return super()._poll(timeout)
+
+        if timeout is None:
+            ms = INFINITE
+        elif timeout < 0:
+            raise ValueError('negative timeout')
+        else:
+            ms = min(math.ceil(timeout * 1e3), INFINITE - 1)
+
+        # no callbacks are ready and the messages were handled by the previous call, so it's time for idle tasks
+        if ms and self._idle is not None and self._idle():
+            ms = 0
+
+        handles = (HANDLE * 1)(self._ready_event)
+        if WATCHDOG.enabled:
+            WATCHDOG.idle()
+        res = user32.MsgWaitForMultipleObjectsEx(1, handles, ms, QS_ALLINPUT, MWMO_INPUTAVAILABLE)
+        if WATCHDOG.enabled:
+            WATCHDOG.heartbeat()
+        if res == WAIT_FAILED:
+            raise OSError('MsgWaitForMultipleObjectsEx failed')
+
+        # handle completions first, so callbacks triggered by messages see the latest I/O state
+        super()._poll(0)
+        if res == WAIT_OBJECT_0:
+            kernel32.ResetEvent(self._ready_event)
+            self._armed.set()
+
+        if not self._pump():
+            # the app quits, the loop is run without the message pump from now on (e.g. to cancel tasks)
+            self._pump = None
+            self._loop.stop()
+
+    def close(self):
+        if self._waiting:
+            self._waiting = False
+            self._armed.set()
+            # wake the waiter thread, the packet isn't put back
+            _overlapped.PostQueuedCompletionStatus(self._iocp, 0, 0, 0)
+            self._waiter.join()
+            kernel32.CloseHandle(self._ready_event)
+        super().close()
+
+
+########################################
+# ProactorEventLoop whose idle wait also dispatches window messages, see MainWin.run_async.
+########################################
+class MessagePumpEventLoop(ProactorEventLoop):
+
+    def __init__(self, pump, idle=None):
+        super().__init__(MessagePumpProactor(pump, idle))
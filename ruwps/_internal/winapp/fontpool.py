@@ -0,0 +1,80 @@
+__all__ = ('FONT_POOL', 'FontPool')
+
+from collections import OrderedDict
+
+from .const import *
+from .dlls import gdi32, user32
+
+
+########################################
+# Process-wide pool of HFONTs keyed by their LOGFONT attributes (face, height, weight, italic) and the DPI they
+# were created for. Handles are reference counted: acquire() returns a shared handle, release() gives it back.
+# Up to max_unused released fonts are kept for reuse. purge() drops all fonts after the DPI or the system fonts
+# changed, fonts that are still in use are deleted when they are released.
+########################################
+class FontPool(object):
+
+    def __init__(self, max_unused=16):
+        self.max_unused = max_unused
+        self.__fonts = {}             # key => hfont
+        self.__refs = {}              # hfont => [key, refcount]
+        self.__unused = OrderedDict()  # hfont => None, released fonts in LRU order
+        self.dpi = self.__system_dpi()
+
+    def __len__(self):
+        return len(self.__refs)
+
+    # height in logical units, as passed to CreateFontW (negative: character height, positive: cell height)
+    def acquire(self, face='MS Shell Dlg', height=8, weight=FW_DONTCARE, italic=False):
+        key = (face, height, weight, bool(italic), self.dpi)
+        hfont = self.__fonts.get(key)
+        if hfont is None:
+            hfont = gdi32.CreateFontW(height, 0, 0, 0, weight, italic, FALSE, FALSE, ANSI_CHARSET, OUT_TT_PRECIS,
+                    CLIP_DEFAULT_PRECIS, DEFAULT_QUALITY, DEFAULT_PITCH | FF_DONTCARE, face)
+            if not hfont:
+                return 0
+            self.__fonts[key] = hfont
+            self.__refs[hfont] = [key, 0]
+        else:
+            self.__unused.pop(hfont, None)
+        self.__refs[hfont][1] += 1
+        return hfont
+
+    def release(self, hfont):
+        ref = self.__refs.get(hfont)
+        if ref is None:
+            return
+        ref[1] -= 1
+        if ref[1] > 0:
+            return
+        if self.__fonts.get(ref[0]) != hfont:  # purged while in use
+            self.__delete(hfont)
+            return
+        self.__unused[hfont] = None
+        while len(self.__unused) > self.max_unused:
+            self.__delete(self.__unused.popitem(last=False)[0])
+
+    # without a dpi (e.g. the system fonts changed) the current one is kept, it may be a monitor's DPI
+    def purge(self, dpi=None):
+        if dpi:
+            self.dpi = dpi
+        for hfont in list(self.__unused):
+            self.__delete(hfont)
+        self.__unused.clear()
+        self.__fonts = {}
+
+    def __delete(self, hfont):
+        key = self.__refs.pop(hfont)[0]
+        if self.__fonts.get(key) == hfont:
+            del self.__fonts[key]
+        gdi32.DeleteObject(hfont)
+
+    @staticmethod
+    def __system_dpi():
+        hdc = user32.GetDC(0)
+        dpi = gdi32.GetDeviceCaps(hdc, LOGPIXELSY)
+        user32.ReleaseDC(0, hdc)
+        return dpi
+
+
+FONT_POOL = FontPool()
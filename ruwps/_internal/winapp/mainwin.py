@@ -1,5 +1,14 @@
 __all__ = ('MainWin',)
 
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
 from ctypes import (windll, WINFUNCTYPE, c_int64, c_int, c_uint, c_uint64, c_long, c_ulong, c_longlong, c_voidp, c_wchar_p, Structure,
         sizeof, byref, create_string_buffer, create_unicode_buffer, cast,  c_char_p, pointer)
 from ctypes.wintypes import (HWND, WORD, DWORD, LONG, HICON, WPARAM, LPARAM, HANDLE, LPCWSTR, MSG, UINT, LPWSTR, HINSTANCE,
@@ -7,12 +16,41 @@ from ctypes.wintypes import (HWND, WORD, DWORD, LONG, HICON, WPARAM, LPARAM, HAN
 
 from .const import *
 from .wintypes_extended import *
-from .dlls import gdi32, user32, ACCEL
+from .dlls import gdi32, user32, wtsapi32, ACCEL, HAS_COALESCABLE_TIMER
 from .window import *
 from .menu import *
+from .precisetimer import PreciseTimers
+from .scheduler import TimerScheduler, WallClockScheduler
+from .fontpool import FONT_POOL
+from .profiler import PROFILER
+from .textmetrics import TEXT_MEASURER
+from .watchdog import WATCHDOG
 from .themes import *
 #from winrumps.dialog import *
 
+# All timers of create_timer share this Win32 timer, see scheduler.py
+SCHEDULER_TIMER_ID = 1
+# create_timer timer that wakes the wall clock timers
+WALLCLOCK_TIMER_ID = 2
+
+# GUID_CONSOLE_DISPLAY_STATE {6FE69556-704A-47A0-8F24-C28D936FDA47}
+GUID_CONSOLE_DISPLAY_STATE = uuid.UUID('6fe69556-704a-47a0-8f24-c28d936fda47').bytes_le
+
+# Private message that wakes the UI thread when calls were queued by call_soon_threadsafe
+WM_CALL_SOON = user32.RegisterWindowMessageW('ruwps.CallSoon')
+
+
+def _run_call(future, callback, args, kwargs):
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        res = callback(*args, **kwargs)
+    except BaseException as e:
+        future.set_exception(e)
+    else:
+        future.set_result(res)
+
+
 VKEY_NAME_MAP = {
     'Del': VK_DELETE,
     'Plus': VK_OEM_PLUS,
@@ -46,37 +84,34 @@ class MainWin(Window):
         self.__window_title = window_title
         self.__has_app_menus = menu_data is not None
         self.__popup_menus = {}
-        self.__timers = {}
+        self.__timers = TimerScheduler(self.__arm_scheduler_timer)
         self.__timer_id_counter = 1000
+        self.__wallclock_timers = None
+        self.__session_state = None  # see __watch_session
+        self.__power_notification = None
+        self.__precise_timers = None  # created on demand
         self.__die = False
-        # For asnyc dialogs
-        self.__current_dialogs = []
+        # For asnyc dialogs, top-level hwnd => Dialog
+        self.__current_dialogs = {}
+        # For call_soon_threadsafe
+        self.__calls = deque()
+        self.__calls_lock = threading.Lock()
+        self.ui_thread_id = threading.get_ident()
+        # For call_when_idle, heap of (priority, sequence number, future, callback, args, kwargs)
+        self.__idle_tasks = []
+        self.__idle_counter = itertools.count()
+        self.__idle_lock = threading.Lock()
+        # max. seconds spent on idle tasks before checking for messages again
+        self.idle_time_slice = 0.01
+        # asyncio loop while run_async is running
+        self.event_loop = None
 
         def _on_WM_TIMER(hwnd, wparam, lparam):
-            if wparam in self.__timers:
-                callback = self.__timers[wparam][0]
-                if self.__timers[wparam][1]:
-                    user32.KillTimer(self.hwnd, wparam)
-                    del self.__timers[wparam]
-                callback()
+            if wparam == SCHEDULER_TIMER_ID:
+                self.__timers.fire()
             # An application should return zero if it processes this message.
             return 0
 
-        self.__message_map = {
-                WM_TIMER:        [_on_WM_TIMER],
-                WM_CLOSE:        [self.quit],
-                }
-
-        def _window_proc_callback(hwnd, msg, wparam, lparam):
-            if msg in self.__message_map:
-                for callback in self.__message_map[msg]:
-                    res = callback(hwnd, wparam, lparam)
-                    if res is not None:
-                        return res
-            return user32.DefWindowProcW(hwnd, msg, wparam, lparam)
-
-        self.windowproc = WNDPROC(_window_proc_callback)
-
         if type(color) == int:
             hbrush = color + 1
         elif type(color) == COLORREF:
@@ -87,7 +122,7 @@ class MainWin(Window):
         self.bg_brush_light = hbrush
 
         newclass = WNDCLASSEX()
-        newclass.lpfnWndProc = self.windowproc
+        newclass.lpfnWndProc = SHARED_WNDPROC
         newclass.style = CS_VREDRAW | CS_HREDRAW
         newclass.lpszClassName = window_class
         newclass.hBrush = hbrush
@@ -114,6 +149,14 @@ class MainWin(Window):
                 parent_window=parent_window
                 )
 
+        # messages sent during CreateWindowExW went to DefWindowProcW, from now on they are dispatched to self
+        self._attach_window_proc()
+        self.register_message_callback(WM_TIMER, _on_WM_TIMER)
+        self.register_message_callback(WM_CLOSE, self.quit)
+        self.register_message_callback(WM_CALL_SOON, self.__run_calls)
+        self.register_message_callback(WM_DPICHANGED, lambda hwnd, wparam, lparam: self.__purge_fonts(HIWORD(wparam)))
+        self.register_message_callback(WM_SETTINGCHANGE, lambda hwnd, wparam, lparam: self.__purge_fonts())
+
         if accelerators:
             accels += accelerators
 
@@ -125,23 +168,192 @@ class MainWin(Window):
         else:
             self.__haccel = None
 
+    def _default_window_proc(self, hwnd, msg, wparam, lparam):
+        return user32.DefWindowProcW(hwnd, msg, wparam, lparam)
+
+    ########################################
+    # Schedules callback(*args, **kwargs) to be called by the UI thread, can be called from any thread.
+    # Returns a concurrent.futures.Future for the result.
+    ########################################
+    def call_soon_threadsafe(self, callback, *args, **kwargs):
+        future = Future()
+        with self.__calls_lock:
+            self.__calls.append((future, callback, args, kwargs))
+            # only the first queued call posts a message, the others are handled by the same batch
+            wake = len(self.__calls) == 1
+        if wake and not user32.PostMessageW(self.hwnd, WM_CALL_SOON, 0, 0):
+            # window is gone (or the message queue is full)
+            self.__cancel_calls()
+        return future
+
+    run_on_ui_thread = call_soon_threadsafe
+
+    def is_ui_thread(self):
+        return threading.get_ident() == self.ui_thread_id
+
+    def __run_calls(self, hwnd, wparam, lparam):
+        # calls queued while the batch runs are handled by the next WM_CALL_SOON
+        with self.__calls_lock:
+            calls, self.__calls = self.__calls, deque()
+        for call in calls:
+            _run_call(*call)
+        return 0
+
+    def __cancel_calls(self):
+        with self.__calls_lock:
+            calls, self.__calls = self.__calls, deque()
+        with self.__idle_lock:
+            calls.extend(task[2:] for task in self.__idle_tasks)
+            self.__idle_tasks = []
+        for future, *_ in calls:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError('UI thread is not running'))
+
+    ########################################
+    # Schedules callback(*args, **kwargs) to be called by the UI thread when its message queue is empty, tasks with
+    # lower priority values run first. Can be called from any thread, returns a concurrent.futures.Future.
+    ########################################
+    def call_when_idle(self, callback, *args, priority=0, **kwargs):
+        future = Future()
+        with self.__idle_lock:
+            heapq.heappush(self.__idle_tasks, (priority, next(self.__idle_counter), future, callback, args, kwargs))
+            wake = len(self.__idle_tasks) == 1
+        if wake and not self.is_ui_thread():
+            user32.PostMessageW(self.hwnd, WM_NULL, 0, 0)
+        return future
+
+    # Runs idle tasks until the time slice is used up or input arrives, returns True if tasks are left
+    def _run_idle_tasks(self):
+        deadline = time.perf_counter() + self.idle_time_slice
+        while self.__idle_tasks:
+            with self.__idle_lock:
+                task = heapq.heappop(self.__idle_tasks)
+            _run_call(*task[2:])
+            if time.perf_counter() >= deadline or user32.GetQueueStatus(QS_ALLINPUT) >> 16:
+                break
+        return len(self.__idle_tasks) > 0
+
     def make_popup_menu(self, menu_data):
         hmenu = user32.CreatePopupMenu()
         MainWin.__handle_menu_items(hmenu, menu_data['items'])
         return hmenu
 
-    def create_timer(self, callback, ms, is_singleshot=False, timer_id=None):
+    ########################################
+    # All timers share a single Win32 timer, see scheduler.py. If tolerance (ms) is > 0, the timer may fire that much
+    # later, so it can be fired with others. Pausable timers don't fire while the session is locked or the display
+    # is off.
+    ########################################
+    def create_timer(self, callback, ms, is_singleshot=False, timer_id=None, tolerance=0, pausable=False):
         if timer_id is None:
             timer_id = self.__timer_id_counter
             self.__timer_id_counter += 1
-        self.__timers[timer_id] = (callback, is_singleshot)
-        user32.SetTimer(self.hwnd, timer_id, ms, 0)
+        if pausable:
+            self.__watch_session()
+        self.__timers.add(timer_id, callback, ms / 1000, is_singleshot, tolerance / 1000, pausable)
+        return timer_id
+
+    ########################################
+    # Fixed-rate timer based on a high-resolution waitable timer, see precisetimer.py. callback(ticks) is called on
+    # the UI thread, ticks > 1 means that ticks were missed. Killed with kill_timer.
+    ########################################
+    def create_precise_timer(self, callback, ms):
+        if self.__precise_timers is None:
+            self.__precise_timers = PreciseTimers(self.call_soon_threadsafe)
+        timer_id = self.__timer_id_counter
+        self.__timer_id_counter += 1
+        self.__precise_timers.add(timer_id, callback, ms / 1000)
         return timer_id
 
+    ########################################
+    # Timer with wall clock deadlines, see scheduler.py. next_run(after) returns the first deadline (a timestamp
+    # like time.time()) after `after`, or None if the timer is done. Deadlines are recomputed when the system time
+    # changes or the system resumes from sleep. Killed with kill_timer.
+    ########################################
+    def create_wallclock_timer(self, callback, next_run):
+        if self.__wallclock_timers is None:
+            self.__wallclock_timers = WallClockScheduler(self.__arm_wallclock_timer)
+
+            def _on_WM_TIMECHANGE(hwnd, wparam, lparam):
+                self.__wallclock_timers.recompute()
+
+            def _on_WM_POWERBROADCAST(hwnd, wparam, lparam):
+                if wparam == PBT_APMRESUMEAUTOMATIC:
+                    self.__wallclock_timers.recompute()
+
+            self.register_message_callback(WM_TIMECHANGE, _on_WM_TIMECHANGE)
+            self.register_message_callback(WM_POWERBROADCAST, _on_WM_POWERBROADCAST)
+        timer_id = self.__timer_id_counter
+        self.__timer_id_counter += 1
+        self.__wallclock_timers.add(timer_id, callback, next_run)
+        return timer_id
+
+    # Returns the next deadline of a wall clock timer, or None if it's done or was killed
+    def get_timer_deadline(self, timer_id):
+        if self.__wallclock_timers is None:
+            return None
+        return self.__wallclock_timers.deadline(timer_id)
+
     def kill_timer(self, timer_id):
-        if timer_id in self.__timers:
-            user32.KillTimer(self.hwnd, timer_id)
-            del self.__timers[timer_id]
+        if self.__precise_timers is not None and self.__precise_timers.remove(timer_id):
+            return
+        if self.__wallclock_timers is not None and self.__wallclock_timers.remove(timer_id):
+            return
+        self.__timers.remove(timer_id)
+
+    def __arm_wallclock_timer(self, seconds):
+        if seconds is None:
+            self.__timers.remove(WALLCLOCK_TIMER_ID)
+        else:
+            self.__timers.add(WALLCLOCK_TIMER_ID, self.__wallclock_timers.fire, seconds, is_singleshot=True)
+
+    # shared fonts (and measurements made with them) are recreated after the DPI or the system fonts changed
+    def __purge_fonts(self, dpi=None):
+        FONT_POOL.purge(dpi)
+        TEXT_MEASURER.clear()
+
+    def __arm_scheduler_timer(self, due, tolerance):
+        if due is None:
+            user32.KillTimer(self.hwnd, SCHEDULER_TIMER_ID)
+            return
+        ms = min(max(USER_TIMER_MINIMUM, math.ceil((due - time.monotonic()) * 1000)), USER_TIMER_MAXIMUM)
+        if tolerance > 0 and HAS_COALESCABLE_TIMER:
+            user32.SetCoalescableTimer(self.hwnd, SCHEDULER_TIMER_ID, ms, None, math.floor(tolerance * 1000))
+        else:
+            user32.SetTimer(self.hwnd, SCHEDULER_TIMER_ID, ms, 0)
+
+    ########################################
+    # Tracks whether the session is locked or the display is off, to pause pausable timers.
+    # Registered when the first pausable timer is created.
+    ########################################
+    def __watch_session(self):
+        if self.__session_state is not None:
+            return
+        self.__session_state = {'locked': False, 'display_off': False}
+
+        def _update():
+            self.__timers.set_active(not any(self.__session_state.values()))
+
+        def _on_WM_WTSSESSION_CHANGE(hwnd, wparam, lparam):
+            if wparam in (WTS_SESSION_LOCK, WTS_SESSION_UNLOCK):
+                self.__session_state['locked'] = wparam == WTS_SESSION_LOCK
+                _update()
+
+        def _on_WM_POWERBROADCAST(hwnd, wparam, lparam):
+            if wparam == PBT_POWERSETTINGCHANGE:
+                setting = cast(lparam, POINTER(POWERBROADCAST_SETTING)).contents
+                if bytes(setting.PowerSetting) == GUID_CONSOLE_DISPLAY_STATE:
+                    # 0: off, 1: on, 2: dimmed
+                    self.__session_state['display_off'] = setting.Data[0] == 0
+                    _update()
+                return TRUE
+
+        self.register_message_callback(WM_WTSSESSION_CHANGE, _on_WM_WTSSESSION_CHANGE)
+        self.register_message_callback(WM_POWERBROADCAST, _on_WM_POWERBROADCAST)
+        wtsapi32.WTSRegisterSessionNotification(self.hwnd, NOTIFY_FOR_THIS_SESSION)
+        # the current state is sent right away
+        guid = (BYTE * 16)(*GUID_CONSOLE_DISPLAY_STATE)
+        self.__power_notification = user32.RegisterPowerSettingNotification(self.hwnd, byref(guid),
+                DEVICE_NOTIFY_WINDOW_HANDLE)
 
 #    def register_message_callback(self, msg, callback, overwrite=False):
 #        if overwrite:
@@ -161,27 +373,106 @@ class MainWin(Window):
 #                    del self.__message_map[msg]
 
     def run(self):
-        msg = MSG()
-        while not self.__die and user32.GetMessageW(byref(msg), 0, 0, 0) != 0:
-
-            # unfortunately this disables global accelerators while a dialog is shown
-            for dialog in self.__current_dialogs:
-                if user32.IsDialogMessageW(dialog.hwnd, byref(msg)):
-                    break
+        while self._pump_messages():
+            # the message queue is empty, so it's time for idle tasks
+            busy = self.__idle_tasks and self._run_idle_tasks()
+            if WATCHDOG.enabled:
+                WATCHDOG.idle()
+            user32.MsgWaitForMultipleObjectsEx(0, None, 0 if busy else INFINITE, QS_ALLINPUT, MWMO_INPUTAVAILABLE)
+            if WATCHDOG.enabled:
+                WATCHDOG.heartbeat()
+        self._destroy()
+        return 0
 
-            # If the inner loop completes without encountering
-            # the break statement then the following else
-            # block will be executed and outer loop will continue
-            else:
-                if not user32.TranslateAcceleratorW(self.hwnd, self.__haccel, byref(msg)):
-                    user32.TranslateMessage(byref(msg))
-                    user32.DispatchMessageW(byref(msg))
+    ########################################
+    # Runs the message loop as part of an asyncio event loop (see eventloop.py), so coroutines and window messages
+    # are handled by the same thread. If main is a coroutine, it's run as a task of the loop.
+    ########################################
+    def run_async(self, main=None):
+        from .eventloop import MessagePumpEventLoop
+        loop = self.event_loop = MessagePumpEventLoop(self._pump_messages, self._run_idle_tasks)
+        asyncio.set_event_loop(loop)
+        try:
+            if main is not None:
+                loop.create_task(main)
+            if not self.__die:
+                loop.run_forever()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            self.event_loop = None
+            loop.close()
+            self._destroy()
+        return 0
 
+    # Handles all pending messages, returns False if the app should quit
+    def _pump_messages(self):
+        msg = MSG()
+        while not self.__die and user32.PeekMessageW(byref(msg), 0, 0, 0, PM_REMOVE):
+            if msg.message == WM_QUIT:
+                self.__die = True
+                break
+            if WATCHDOG.enabled:
+                WATCHDOG.heartbeat()
+            self._dispatch_message(msg)
+        return not self.__die
+
+    def _dispatch_message(self, msg):
+        # messages for an async dialog (or one of its controls) are passed to that dialog only, all others can
+        # still trigger accelerators
+        if self.__current_dialogs and msg.hwnd:
+            dialog = self.__current_dialogs.get(user32.GetAncestor(msg.hwnd, GA_ROOT))
+            if dialog is not None and user32.IsDialogMessageW(dialog.hwnd, byref(msg)):
+                return
+        if not self.__haccel or not user32.TranslateAcceleratorW(self.hwnd, self.__haccel, byref(msg)):
+            user32.TranslateMessage(byref(msg))
+            user32.DispatchMessageW(byref(msg))
+
+    def _destroy(self):
         if self.__haccel:
             user32.DestroyAcceleratorTable(self.__haccel)
         user32.DestroyWindow(self.hwnd)
         user32.DestroyIcon(self.hicon)
-        return 0
+        if self.__precise_timers is not None:
+            self.__precise_timers.close()
+            self.__precise_timers = None
+        if self.__session_state is not None:
+            wtsapi32.WTSUnRegisterSessionNotification(self.hwnd)
+            user32.UnregisterPowerSettingNotification(self.__power_notification)
+        # don't leave threads waiting for calls that never run
+        self.__cancel_calls()
+        WATCHDOG.stop()
+
+    ########################################
+    # Timings of message dispatch and callbacks on the UI thread, see profiler.py. Off by default.
+    ########################################
+    @property
+    def profiling(self):
+        return PROFILER.enabled
+
+    @profiling.setter
+    def profiling(self, value):
+        PROFILER.enabled = bool(value)
+
+    def profile_snapshot(self, reset=False):
+        res = PROFILER.snapshot()
+        if reset:
+            PROFILER.reset()
+        return res
+
+    ########################################
+    # Reports stalls of the UI thread (no message handled for threshold seconds while it's busy) by calling
+    # callback(stalled_seconds, stack) in a watchdog thread, see watchdog.py.
+    ########################################
+    def start_watchdog(self, callback, threshold=0.25, report_interval=5.0):
+        WATCHDOG.start(self.ui_thread_id, callback, threshold, report_interval)
+
+    def stop_watchdog(self):
+        WATCHDOG.stop()
 
     def quit(self, *args):
         self.__die = True
@@ -268,8 +559,8 @@ class MainWin(Window):
         self.redraw_window()
 
     def dialog_show_async(self, dialog):
-        self.__current_dialogs.append(dialog)
         dialog._show_async()
+        self.__current_dialogs[dialog.hwnd] = dialog
 
     def dialog_show_sync(self, dialog, lparam=0):
         res = dialog._show_sync(lparam=lparam)
@@ -277,8 +568,8 @@ class MainWin(Window):
         return res
 
     def _dialog_remove(self, dialog):
-        if dialog in self.__current_dialogs:
-            self.__current_dialogs.remove(dialog)
+        if self.__current_dialogs.get(dialog.hwnd) is dialog:
+            del self.__current_dialogs[dialog.hwnd]
 
     @staticmethod
     def __handle_menu_items(hmenu, menu_items, accels=None, key_mod_translation=None):
@@ -0,0 +1,103 @@
+__all__ = ('PreciseTimers',)
+
+import heapq
+import math
+import threading
+import time
+import traceback
+from ctypes import byref
+from ctypes.wintypes import HANDLE, LARGE_INTEGER
+
+from .const import *
+from .dlls import kernel32
+
+
+########################################
+# Fixed-rate timers driven by a high-resolution waitable timer in a thread of their own. Deadlines are absolute
+# (start + n * interval on time.perf_counter), so unlike WM_TIMER they don't drift. Due timers are passed to the UI
+# thread with post(func, *args) (MainWin.call_soon_threadsafe). Ticks that become due while a delivery is still
+# pending are added up, callback(ticks) gets their number.
+########################################
+class PreciseTimers(object):
+
+    def __init__(self, post):
+        self._post = post
+        self._entries = {}  # timer_id => [deadline, interval, callback, ticks, pending]
+        self._heap = []     # (deadline, timer_id, entry), entries of removed timers are skipped
+        self._lock = threading.Lock()
+        self._closing = False
+        self._timer = kernel32.CreateWaitableTimerExW(None, None, CREATE_WAITABLE_TIMER_HIGH_RESOLUTION,
+                TIMER_ALL_ACCESS)
+        if not self._timer:
+            # high resolution timers need Windows 10 1803
+            self._timer = kernel32.CreateWaitableTimerExW(None, None, 0, TIMER_ALL_ACCESS)
+        self._wake_event = kernel32.CreateEventW(None, False, False, None)
+        self._thread = threading.Thread(target=self._run, name='ruwps-precise-timers', daemon=True)
+        self._thread.start()
+
+    def __contains__(self, timer_id):
+        return timer_id in self._entries
+
+    def add(self, timer_id, callback, interval):
+        entry = [time.perf_counter() + interval, interval, callback, 0, False]
+        with self._lock:
+            self._entries[timer_id] = entry
+            heapq.heappush(self._heap, (entry[0], timer_id, entry))
+        kernel32.SetEvent(self._wake_event)
+
+    def remove(self, timer_id):
+        with self._lock:
+            return self._entries.pop(timer_id, None) is not None
+
+    def close(self):
+        self._closing = True
+        kernel32.SetEvent(self._wake_event)
+        self._thread.join()
+        kernel32.CloseHandle(self._timer)
+        kernel32.CloseHandle(self._wake_event)
+
+    def _run(self):
+        handles = (HANDLE * 2)(self._wake_event, self._timer)
+        while not self._closing:
+            with self._lock:
+                heap = self._heap
+                while heap and self._entries.get(heap[0][1]) is not heap[0][2]:
+                    heapq.heappop(heap)
+                deadline = heap[0][0] if heap else None
+            if deadline is None:
+                kernel32.WaitForMultipleObjects(1, handles, False, INFINITE)
+                continue
+            # negative due time = relative, in 100 ns units
+            due = LARGE_INTEGER(-max(0, int((deadline - time.perf_counter()) * 1e7)))
+            kernel32.SetWaitableTimer(self._timer, byref(due), 0, None, None, False)
+            kernel32.WaitForMultipleObjects(2, handles, False, INFINITE)
+            self._collect(time.perf_counter())
+
+    def _collect(self, now):
+        deliveries = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                deadline, timer_id, entry = heapq.heappop(heap)
+                if self._entries.get(timer_id) is not entry:
+                    continue
+                ticks = math.floor((now - deadline) / entry[1]) + 1
+                entry[0] = deadline + ticks * entry[1]
+                heapq.heappush(heap, (entry[0], timer_id, entry))
+                entry[3] += ticks
+                if not entry[4]:
+                    entry[4] = True
+                    deliveries.append((timer_id, entry))
+        for timer_id, entry in deliveries:
+            self._post(self._deliver, timer_id, entry)
+
+    # called in the UI thread
+    def _deliver(self, timer_id, entry):
+        with self._lock:
+            ticks, entry[3], entry[4] = entry[3], 0, False
+        if self._entries.get(timer_id) is entry:
+            # the Future of post() isn't read by anyone, errors have to be reported here
+            try:
+                entry[2](ticks)
+            except Exception:
+                traceback.print_exc()
@@ -0,0 +1,78 @@
+__all__ = ('PROFILER', 'Profiler')
+
+import random
+import time
+
+from . import const
+
+
+# message id => name, for snapshots
+_MESSAGE_NAMES = {}
+for name, value in vars(const).items():
+    if name.startswith('WM_') and type(value) == int:
+        _MESSAGE_NAMES.setdefault(value, name)
+
+
+########################################
+# Records durations (time.perf_counter_ns) per message id and per callback. Percentiles are computed from a
+# reservoir sample of at most reservoir_size durations per key. Call sites check `enabled` first, so a disabled
+# profiler only costs an attribute lookup per dispatch.
+########################################
+class Profiler(object):
+
+    def __init__(self, reservoir_size=1024):
+        self.enabled = False
+        self.reservoir_size = reservoir_size
+        self.__stats = {}  # (kind, key) => [count, total_ns, max_ns, samples]
+
+    def record(self, kind, key, ns):
+        stats = self.__stats.get((kind, key))
+        if stats is None:
+            stats = self.__stats[(kind, key)] = [0, 0, 0, []]
+        stats[0] += 1
+        stats[1] += ns
+        if ns > stats[2]:
+            stats[2] = ns
+        samples = stats[3]
+        if len(samples) < self.reservoir_size:
+            samples.append(ns)
+        else:
+            i = random.randrange(stats[0])
+            if i < self.reservoir_size:
+                samples[i] = ns
+
+    def call(self, kind, key, func, *args, **kwargs):
+        t = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.record(kind, key, time.perf_counter_ns() - t)
+
+    def call_callback(self, callback, *args, **kwargs):
+        name = getattr(callback, '__qualname__', None) or repr(callback)
+        return self.call('callback', name, callback, *args, **kwargs)
+
+    def reset(self):
+        self.__stats = {}
+
+    ########################################
+    # Returns {kind: {key: {'count', 'total_ms', 'p50_ms', 'p99_ms', 'max_ms'}}}, kind is 'message',
+    # 'dialog_message' or 'callback'. Message keys are names like 'WM_TIMER' (or the id if the name is unknown).
+    ########################################
+    def snapshot(self):
+        res = {}
+        for (kind, key), (count, total, max_ns, samples) in list(self.__stats.items()):
+            if kind != 'callback':
+                key = _MESSAGE_NAMES.get(key, key)
+            samples = sorted(samples)
+            res.setdefault(kind, {})[key] = {
+                'count': count,
+                'total_ms': total / 1e6,
+                'p50_ms': samples[(len(samples) - 1) // 2] / 1e6,
+                'p99_ms': samples[(len(samples) - 1) * 99 // 100] / 1e6,
+                'max_ms': max_ns / 1e6,
+            }
+        return res
+
+
+PROFILER = Profiler()
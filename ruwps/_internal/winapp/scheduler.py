@@ -0,0 +1,243 @@
+__all__ = ('TimerScheduler', 'WallClockScheduler')
+
+import heapq
+import time
+import traceback
+
+
+# WM_TIMER can arrive a bit early, timers due within this many seconds are fired with the current ones
+TIMER_SLACK = 0.001
+
+
+class _TimerEntry(object):
+    __slots__ = ('deadline', 'interval', 'callback', 'is_singleshot', 'tolerance', 'pausable')
+
+    def __init__(self, deadline, interval, callback, is_singleshot, tolerance, pausable):
+        self.deadline = deadline
+        self.interval = interval
+        self.callback = callback
+        self.is_singleshot = is_singleshot
+        self.tolerance = tolerance
+        self.pausable = pausable
+
+
+########################################
+# Timers of MainWin.create_timer, driven by a single Win32 timer. arm(due, tolerance) sets that timer to the
+# monotonic time `due` (it may fire up to `tolerance` seconds later), arm(None, 0) kills it; fire() has to be called
+# when it fires.
+#
+# Each timer may fire up to `tolerance` seconds after its deadline. The Win32 timer is set to the latest deadline
+# that still lies in the window of the timer whose window ends first, so timers with overlapping windows fire in one
+# wakeup. Pausable timers don't fire (and don't wake the thread) while the scheduler is inactive, timers that
+# became due in the meantime fire once when it's active again.
+#
+# Timers are kept in two heaps, one ordered by deadline and one by end of window. Entries of killed or rescheduled
+# timers are skipped (and dropped) when they reach the top.
+########################################
+class TimerScheduler(object):
+
+    def __init__(self, arm):
+        self._arm = arm
+        self._entries = {}      # timer_id => _TimerEntry
+        self._paused = {}       # timer_id => _TimerEntry, pausable timers while inactive
+        self._deadlines = []    # (deadline, timer_id, entry)
+        self._ends = []         # (deadline + tolerance, timer_id, entry)
+        self._armed = None
+        self.active = True
+
+    def __contains__(self, timer_id):
+        return timer_id in self._entries or timer_id in self._paused
+
+    def add(self, timer_id, callback, interval, is_singleshot=False, tolerance=0.0, pausable=False):
+        self.remove(timer_id, rearm=False)
+        entry = _TimerEntry(time.monotonic() + interval, interval, callback, is_singleshot, tolerance, pausable)
+        if pausable and not self.active:
+            self._paused[timer_id] = entry
+        else:
+            self._push(timer_id, entry)
+        self._rearm()
+
+    def remove(self, timer_id, rearm=True):
+        entry = self._entries.pop(timer_id, None) or self._paused.pop(timer_id, None)
+        if entry is None:
+            return False
+        # heap entries are dropped when they reach the top, unless the heaps are mostly made of removed timers
+        if len(self._deadlines) > 64 and len(self._deadlines) > 2 * len(self._entries):
+            self._deadlines = [item for item in self._deadlines if self._is_current(item, 0)]
+            self._ends = [item for item in self._ends if self._is_current(item, item[2].tolerance)]
+            heapq.heapify(self._deadlines)
+            heapq.heapify(self._ends)
+        if rearm:
+            self._rearm()
+        return True
+
+    def set_active(self, active):
+        if active == self.active:
+            return
+        self.active = active
+        if active:
+            for timer_id, entry in self._paused.items():
+                self._push(timer_id, entry)
+            self._paused = {}
+        else:
+            for timer_id, entry in list(self._entries.items()):
+                if entry.pausable:
+                    del self._entries[timer_id]
+                    self._paused[timer_id] = entry
+        self._rearm()
+
+    def fire(self):
+        self._armed = None
+        now = time.monotonic()
+        due = []
+        while self._deadlines and self._deadlines[0][0] <= now + TIMER_SLACK:
+            item = heapq.heappop(self._deadlines)
+            if not self._is_current(item, 0):
+                continue
+            timer_id, entry = item[1], item[2]
+            due.append((timer_id, entry))
+            if not entry.is_singleshot:
+                # like SetTimer, the next period starts now
+                entry.deadline = now + entry.interval
+                self._push(timer_id, entry)
+        try:
+            for timer_id, entry in due:
+                # an earlier callback may have removed this timer
+                if self._entries.get(timer_id) is not entry:
+                    continue
+                if entry.is_singleshot:
+                    del self._entries[timer_id]
+                # a failing callback must not keep the other timers from firing
+                try:
+                    entry.callback()
+                except Exception:
+                    traceback.print_exc()
+        finally:
+            self._rearm()
+
+    def _push(self, timer_id, entry):
+        self._entries[timer_id] = entry
+        heapq.heappush(self._deadlines, (entry.deadline, timer_id, entry))
+        heapq.heappush(self._ends, (entry.deadline + entry.tolerance, timer_id, entry))
+
+    def _is_current(self, item, tolerance):
+        entry = item[2]
+        return self._entries.get(item[1]) is entry and item[0] == entry.deadline + tolerance
+
+    def _rearm(self):
+        while self._deadlines and not self._is_current(self._deadlines[0], 0):
+            heapq.heappop(self._deadlines)
+        while self._ends and not self._is_current(self._ends[0], self._ends[0][2].tolerance):
+            heapq.heappop(self._ends)
+        if not self._deadlines:
+            armed = None
+        else:
+            end = self._ends[0][0]
+            # latest deadline <= end, only the part of the heap with deadlines <= end is visited
+            due, stack, heap = self._deadlines[0][0], [0], self._deadlines
+            while stack:
+                i = stack.pop()
+                if i < len(heap) and heap[i][0] <= end:
+                    if heap[i][0] > due and self._is_current(heap[i], 0):
+                        due = heap[i][0]
+                    stack += (2 * i + 1, 2 * i + 2)
+            armed = (due, end - due)
+        if armed != self._armed:
+            self._armed = armed
+            self._arm(*(armed or (None, 0)))
+
+
+########################################
+# Timers with wall clock (time.time) deadlines, e.g. for cron jobs. next_run(after) returns the first deadline
+# after the timestamp `after`, or None if the timer is done, it's called when the timer is added and after each
+# run. arm(seconds) has to set a singleshot timer that calls fire() (arm(None) kills it). The monotonic timer
+# doesn't follow changes of the system time, so recompute() has to be called after the clock was changed or the
+# system resumed.
+########################################
+class WallClockScheduler(object):
+
+    # the timer is set at most this far ahead, so deadlines stay accurate if the clock drifts (e.g. NTP adjustments)
+    MAX_ARM = 3600.0
+
+    def __init__(self, arm):
+        self._arm = arm
+        self._entries = {}  # timer_id => [deadline, next_run, callback]
+        self._heap = []     # (deadline, timer_id, entry)
+
+    def __contains__(self, timer_id):
+        return timer_id in self._entries
+
+    def add(self, timer_id, callback, next_run):
+        self._entries.pop(timer_id, None)
+        deadline = next_run(time.time())
+        if deadline is not None:
+            self._push(timer_id, [deadline, next_run, callback])
+        self._rearm()
+
+    def remove(self, timer_id):
+        if self._entries.pop(timer_id, None) is None:
+            return False
+        self._rearm()
+        return True
+
+    def deadline(self, timer_id):
+        entry = self._entries.get(timer_id)
+        return entry[0] if entry else None
+
+    def recompute(self):
+        now = time.time()
+        for entry in self._entries.values():
+            # deadlines that passed while the clock was set forward (or the system was asleep) fire once, if the
+            # clock was set back the next deadline may now be earlier
+            deadline = entry[1](now)
+            if deadline is not None and deadline < entry[0]:
+                entry[0] = deadline
+        self._heap = [(entry[0], timer_id, entry) for timer_id, entry in self._entries.items()]
+        heapq.heapify(self._heap)
+        self._rearm()
+
+    def fire(self):
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now + TIMER_SLACK:
+            item = heapq.heappop(self._heap)
+            if self._is_current(item):
+                due.append(item[1:])
+        try:
+            for timer_id, entry in due:
+                # an earlier callback may have removed this timer
+                if self._entries.get(timer_id) is not entry:
+                    continue
+                try:
+                    deadline = entry[1](max(now, entry[0]))
+                except Exception:
+                    # without a next deadline the timer can't be rescheduled
+                    traceback.print_exc()
+                    deadline = None
+                if deadline is None:
+                    del self._entries[timer_id]
+                else:
+                    entry[0] = deadline
+                    heapq.heappush(self._heap, (deadline, timer_id, entry))
+                try:
+                    entry[2]()
+                except Exception:
+                    traceback.print_exc()
+        finally:
+            # the singleshot Win32 timer that called fire() is gone, it has to be set again in any case
+            self._rearm()
+
+    def _push(self, timer_id, entry):
+        self._entries[timer_id] = entry
+        heapq.heappush(self._heap, (entry[0], timer_id, entry))
+
+    def _is_current(self, item):
+        return self._entries.get(item[1]) is item[2] and item[0] == item[2][0]
+
+    def _rearm(self):
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        if self._heap:
+            self._arm(min(max(0.0, self._heap[0][0] - time.time()), self.MAX_ARM))
+        else:
+            self._arm(None)
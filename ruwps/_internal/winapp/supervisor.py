@@ -0,0 +1,267 @@
+__all__ = ('ProcessSupervisor', 'SupervisedProcess')
+
+import random
+import subprocess
+import threading
+import time
+import traceback
+from collections import deque
+from ctypes import WinError, byref
+from ctypes.wintypes import HANDLE
+
+from .const import *
+from .dlls import kernel32
+
+
+########################################
+# A child process started by ProcessSupervisor.start
+########################################
+class SupervisedProcess(object):
+
+    def __init__(self, name, args, restart, popen_kwargs, buffer_lines):
+        self.name = name
+        self.args = args
+        self.restart = restart
+        self.popen_kwargs = popen_kwargs
+        self.popen = None
+        self.returncode = None
+        self.restarts = 0
+        self.stopped = False
+        # last lines of output, only filled if the process was started with capture_output=True
+        self.stdout = deque(maxlen=buffer_lines)
+        self.stderr = deque(maxlen=buffer_lines)
+        self._handle = None
+        self._started_at = None
+        self._restart_timer = None
+
+    def __repr__(self):
+        return '<{}: [{}; pid: {}; returncode: {}; restarts: {}]>'.format(type(self).__name__, repr(self.name),
+                self.pid, self.returncode, self.restarts)
+
+    @property
+    def pid(self):
+        return self.popen.pid if self.popen else None
+
+    def is_running(self):
+        return self.popen is not None and self.returncode is None
+
+
+########################################
+# Waits for up to MAXIMUM_WAIT_OBJECTS - 1 process handles, the first handle is an event used to wake the thread
+# when the set of handles changes.
+########################################
+class _WaitGroup(object):
+
+    SIZE = MAXIMUM_WAIT_OBJECTS - 1
+
+    def __init__(self, on_exit):
+        self._on_exit = on_exit
+        self._procs = []
+        self._lock = threading.Lock()
+        self._closing = False
+        self._wake_event = kernel32.CreateEventW(None, False, False, None)
+        self._thread = threading.Thread(target=self._run, name='ruwps-supervisor', daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self._procs)
+
+    def add(self, proc):
+        with self._lock:
+            self._procs.append(proc)
+        kernel32.SetEvent(self._wake_event)
+
+    def close(self):
+        self._closing = True
+        kernel32.SetEvent(self._wake_event)
+        self._thread.join()
+        kernel32.CloseHandle(self._wake_event)
+        # processes whose exit wasn't seen are no longer watched
+        with self._lock:
+            procs, self._procs = self._procs, []
+        for proc in procs:
+            kernel32.CloseHandle(proc._handle)
+            proc._handle = None
+
+    def _run(self):
+        while not self._closing:
+            # the thread has to keep watching the other processes, whatever went wrong
+            try:
+                self._wait()
+            except Exception:
+                traceback.print_exc()
+
+    def _wait(self):
+        with self._lock:
+            procs = list(self._procs)
+        handles = (HANDLE * (len(procs) + 1))(self._wake_event, *(p._handle for p in procs))
+        res = kernel32.WaitForMultipleObjects(len(handles), handles, False, INFINITE)
+        if res == WAIT_FAILED:
+            error = WinError()
+            if not self._drop_invalid(procs):
+                time.sleep(1)
+            raise error
+        if res == WAIT_OBJECT_0:
+            return
+        proc = procs[res - WAIT_OBJECT_0 - 1]
+        with self._lock:
+            self._procs.remove(proc)
+        self._on_exit(proc)
+
+    # WaitForMultipleObjects fails as a whole if one of the handles is invalid. Such processes get a new handle if
+    # they are still running, otherwise they are reported as exited. Returns False if all handles were valid.
+    def _drop_invalid(self, procs):
+        found = False
+        for proc in procs:
+            handle = HANDLE(proc._handle)
+            if kernel32.WaitForMultipleObjects(1, byref(handle), False, 0) != WAIT_FAILED:
+                continue
+            found = True
+            if proc.popen.poll() is None:
+                proc._handle = kernel32.OpenProcess(SYNCHRONIZE, False, proc.popen.pid)
+                if proc._handle:
+                    continue
+            with self._lock:
+                self._procs.remove(proc)
+            self._on_exit(proc)
+        return found
+
+
+########################################
+# Watches child processes with wait threads instead of polling them. Exits are passed to _dispatch, which calls
+# the given function (by default directly in the wait thread, ruwps.Supervisor passes it to the UI thread).
+#
+# Processes started with restart=True are restarted if they exit without being stopped, up to max_restarts times
+# in a row, after a delay of backoff * 2 ** restarts seconds (at most max_backoff), randomized by +/- jitter
+# (a fraction of the delay). The restart count is reset once a process ran for at least stable_after seconds.
+########################################
+class ProcessSupervisor(object):
+
+    def __init__(self, on_exit=None, on_restart=None, max_restarts=3, backoff=1.0, max_backoff=60.0, jitter=0.1,
+            stable_after=60.0, buffer_lines=200):
+        self.on_exit = on_exit
+        self.on_restart = on_restart
+        self.max_restarts = max_restarts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.stable_after = stable_after
+        self.buffer_lines = buffer_lines
+        self.processes = {}  # name => SupervisedProcess
+        self._groups = []
+        self._groups_lock = threading.Lock()
+
+    def __getitem__(self, name):
+        return self.processes[name]
+
+    def start(self, name, args, restart=False, capture_output=False, **popen_kwargs):
+        """Starts args (like subprocess.Popen) as process `name`, keyword arguments are passed to Popen."""
+        proc = self.processes.get(name)
+        if proc is not None and proc.is_running():
+            raise RuntimeError('process {} is already running'.format(repr(name)))
+        if capture_output:
+            popen_kwargs.update(stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        proc = self.processes[name] = SupervisedProcess(name, args, restart, popen_kwargs, self.buffer_lines)
+        self._spawn(proc)
+        return proc
+
+    def stop(self, name, timeout=None):
+        """Terminates process `name` without restarting it. If timeout is not None, waits for it to exit."""
+        proc = self.processes[name]
+        proc.stopped = True
+        if proc._restart_timer is not None:
+            proc._restart_timer.cancel()
+            proc._restart_timer = None
+        if proc.is_running():
+            proc.popen.terminate()
+            if timeout is not None:
+                proc.popen.wait(timeout)
+        return proc
+
+    def remove(self, name):
+        self.stop(name)
+        return self.processes.pop(name)
+
+    def close(self, timeout=None):
+        for name in list(self.processes):
+            self.stop(name, timeout)
+        with self._groups_lock:
+            groups, self._groups = self._groups, []
+        for group in groups:
+            group.close()
+
+    def _spawn(self, proc):
+        popen = subprocess.Popen(proc.args, **proc.popen_kwargs)
+        proc.returncode = None
+        proc.popen = popen
+        proc._started_at = time.monotonic()
+        proc._handle = kernel32.OpenProcess(SYNCHRONIZE, False, proc.popen.pid)
+        if not proc._handle:
+            raise WinError()
+        for stream, buffer in ((proc.popen.stdout, proc.stdout), (proc.popen.stderr, proc.stderr)):
+            if stream is not None:
+                threading.Thread(target=self._read_lines, args=(stream, buffer), daemon=True).start()
+        with self._groups_lock:
+            for group in self._groups:
+                if len(group) < _WaitGroup.SIZE:
+                    break
+            else:
+                group = _WaitGroup(self._on_process_signaled)
+                self._groups.append(group)
+            group.add(proc)
+
+    @staticmethod
+    def _read_lines(stream, buffer):
+        with stream:
+            for line in stream:
+                if type(line) == bytes:
+                    line = line.decode(errors='replace')
+                buffer.append(line.rstrip('\r\n'))
+
+    # called in a wait thread
+    def _on_process_signaled(self, proc):
+        kernel32.CloseHandle(proc._handle)
+        proc._handle = None
+        proc.returncode = proc.popen.wait()
+        self._dispatch(self._on_process_exit, proc)
+
+    def _on_process_exit(self, proc):
+        if time.monotonic() - proc._started_at >= self.stable_after:
+            proc.restarts = 0
+        if self.on_exit is not None:
+            # a failing callback must not keep the process from being restarted
+            try:
+                self._call(self.on_exit, proc)
+            except Exception:
+                traceback.print_exc()
+        if proc.stopped or not proc.restart or proc.restarts >= self.max_restarts:
+            return
+        delay = min(self.max_backoff, self.backoff * 2 ** proc.restarts)
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        proc._restart_timer = threading.Timer(delay, self._dispatch, (self._restart, proc))
+        proc._restart_timer.daemon = True
+        proc._restart_timer.start()
+
+    def _restart(self, proc):
+        proc._restart_timer = None
+        if proc.stopped or self.processes.get(proc.name) is not proc:
+            return
+        proc.restarts += 1
+        # ruwps.Supervisor runs this on the UI thread, where nobody would see the error
+        try:
+            self._spawn(proc)
+        except Exception:
+            # e.g. the executable was removed, the process stays down
+            traceback.print_exc()
+            return
+        if self.on_restart is not None:
+            try:
+                self._call(self.on_restart, proc)
+            except Exception:
+                traceback.print_exc()
+
+    def _dispatch(self, func, *args):
+        func(*args)
+
+    def _call(self, callback, *args):
+        callback(*args)
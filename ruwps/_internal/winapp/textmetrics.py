@@ -0,0 +1,90 @@
+__all__ = ('TEXT_MEASURER', 'TextMeasurer')
+
+from collections import OrderedDict
+from ctypes import byref
+from ctypes.wintypes import RECT
+
+from .const import *
+from .dlls import gdi32, user32
+from .fontpool import FONT_POOL
+
+
+########################################
+# Measures text with DrawTextW(DT_CALCRECT) in a single memory DC. Fonts are given as (face, height[, weight]),
+# height in logical units as passed to CreateFontW, and taken from FONT_POOL once per (face, height, weight, DPI);
+# an existing HFONT can be passed instead. Results are kept in an LRU cache of max_size entries keyed by (text,
+# width, flags, font), except for passed HFONTs: the handle value may be reused for another font once the font was
+# deleted, e.g. with the dialog it belonged to. measure_many() measures a list of strings with a single font
+# selection.
+########################################
+class TextMeasurer(object):
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.__hdc = None
+        self.__fonts = {}                # (face, height, weight, dpi) => hfont
+        self.__results = OrderedDict()  # (text, width, flags, font key) => (cx, cy)
+
+    def __len__(self):
+        return len(self.__results)
+
+    # Returns (cx, cy). If width is > 0, text is wrapped at that width.
+    def measure(self, text, width=0, font=('MS Shell Dlg', 8), hfont=None, flags=None):
+        return self.measure_many((text,), width, font, hfont, flags)[0]
+
+    def measure_many(self, texts, width=0, font=('MS Shell Dlg', 8), hfont=None, flags=None):
+        if flags is None:
+            flags = DT_LEFT | DT_TOP | DT_NOPREFIX | (DT_WORDBREAK if width else 0)
+        hdc = self.__get_dc()
+        font_key = None if hfont else self.__font_key(font)
+        rc = RECT()
+        old_font = None
+        res = []
+        for text in texts:
+            key = (text, width, flags, font_key)
+            size = self.__results.get(key) if font_key else None
+            if size is None:
+                if old_font is None:
+                    old_font = gdi32.SelectObject(hdc, hfont or self.__get_font(font_key))
+                rc.left = rc.top = rc.bottom = 0
+                rc.right = width
+                user32.DrawTextW(hdc, text, -1, byref(rc), flags | DT_CALCRECT)
+                size = (rc.right, rc.bottom)
+                if font_key:
+                    self.__results[key] = size
+            else:
+                self.__results.move_to_end(key)
+            res.append(size)
+        if old_font is not None:
+            gdi32.SelectObject(hdc, old_font)
+            while len(self.__results) > self.max_size:
+                self.__results.popitem(last=False)
+        return res
+
+    # Releases the fonts and forgets all results, e.g. after the DPI or system fonts changed
+    def clear(self):
+        for hfont in self.__fonts.values():
+            FONT_POOL.release(hfont)
+        self.__fonts = {}
+        self.__results.clear()
+        if self.__hdc is not None:
+            gdi32.DeleteDC(self.__hdc)
+            self.__hdc = None
+
+    def __get_dc(self):
+        if self.__hdc is None:
+            self.__hdc = gdi32.CreateCompatibleDC(0)
+        return self.__hdc
+
+    def __font_key(self, font):
+        face, height, weight = (tuple(font) + (FW_DONTCARE,))[:3]
+        return (face, height, weight, FONT_POOL.dpi)
+
+    def __get_font(self, font_key):
+        hfont = self.__fonts.get(font_key)
+        if hfont is None:
+            hfont = self.__fonts[font_key] = FONT_POOL.acquire(*font_key[:3])
+        return hfont
+
+
+TEXT_MEASURER = TextMeasurer()
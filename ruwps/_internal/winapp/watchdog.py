@@ -0,0 +1,72 @@
+__all__ = ('WATCHDOG', 'Watchdog')
+
+import sys
+import threading
+import time
+import traceback
+
+
+########################################
+# Detects stalls of the UI thread. The message pump and the shared window procedure call heartbeat() for every
+# message, and idle() before the thread blocks waiting for messages (or a modal loop sends WM_ENTERIDLE). If the
+# thread is busy and no heartbeat arrived for `threshold` seconds, the watchdog thread captures the UI thread's
+# Python stack and passes it to callback(stalled_seconds, stack). Each stall is reported only once, and at most one
+# report is made every report_interval seconds.
+########################################
+class Watchdog(object):
+
+    def __init__(self):
+        self.enabled = False
+        self._last_beat = 0.0
+        self._idle = True
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def heartbeat(self):
+        self._last_beat = time.monotonic()
+        self._idle = False
+
+    def idle(self):
+        self._idle = True
+
+    def start(self, thread_id, callback, threshold=0.25, report_interval=5.0):
+        self.stop()
+        self.heartbeat()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(thread_id, callback, threshold, report_interval),
+                name='ruwps-watchdog', daemon=True)
+        self.enabled = True
+        self._thread.start()
+
+    def stop(self):
+        self.enabled = False
+        if self._thread is not None:
+            self._stop_event.set()
+            if self._thread is not threading.current_thread():
+                self._thread.join()
+            self._thread = None
+
+    def _run(self, thread_id, callback, threshold, report_interval):
+        reported_beat = None
+        last_report = None
+        while not self._stop_event.wait(threshold / 2):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat
+            if self._idle or stalled < threshold or beat == reported_beat:
+                continue
+            now = time.monotonic()
+            if last_report is not None and now - last_report < report_interval:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:  # thread is gone
+                break
+            stack = ''.join(traceback.format_stack(frame))
+            del frame
+            reported_beat, last_report = beat, now
+            try:
+                callback(stalled, stack)
+            except Exception:
+                traceback.print_exc()
+
+
+WATCHDOG = Watchdog()
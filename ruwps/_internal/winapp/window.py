@@ -1,9 +1,14 @@
-from ctypes import windll, Structure, sizeof, c_int, c_uint, byref, c_voidp, create_unicode_buffer
+import weakref
+
+from ctypes import windll, Structure, sizeof, c_int, c_uint, byref, c_voidp, create_unicode_buffer, cast, POINTER
 from ctypes.wintypes import LPCWSTR, HANDLE, RECT, POINT, HINSTANCE, DWORD, INT, HWND, HMENU, LPVOID
 
 from .const import *
-from .wintypes_extended import WNDPROC, WNDENUMPROC, MAKELONG, MAKELPARAM
+from .wintypes_extended import WNDPROC, WNDENUMPROC, MAKELONG, MAKELPARAM, LOWORD, NMHDR
 from .dlls import gdi32, kernel32, user32, uxtheme
+from .profiler import PROFILER
+from .watchdog import WATCHDOG
+from .fontpool import FONT_POOL
 from .controls.common import *
 from .themes import *
 
@@ -12,6 +17,42 @@ DPI_X = gdi32.GetDeviceCaps(hdc, LOGPIXELSX)
 DPI_Y = gdi32.GetDeviceCaps(hdc, LOGPIXELSY)
 user32.ReleaseDC(0, hdc)
 
+# Messages sent by child controls to their parent, which can be routed by child HWND or control id
+CTLCOLOR_MESSAGES = (WM_CTLCOLORMSGBOX, WM_CTLCOLOREDIT, WM_CTLCOLORLISTBOX, WM_CTLCOLORBTN, WM_CTLCOLORDLG,
+        WM_CTLCOLORSCROLLBAR, WM_CTLCOLORSTATIC)
+CHILD_MESSAGES = CTLCOLOR_MESSAGES + (WM_COMMAND, WM_NOTIFY)
+
+########################################
+# All Window wrappers share a single WNDPROC thunk, which looks up the wrapper by HWND. A subclassed window whose
+# wrapper was garbage collected falls back to its original window procedure.
+########################################
+_windows = weakref.WeakValueDictionary()  # hwnd => Window
+_old_procs = {}                           # hwnd => original window procedure of a subclassed window
+
+def _window_proc(hwnd, msg, wparam, lparam):
+    if WATCHDOG.enabled:
+        # also called from modal loops (menus, sync dialogs), which send WM_ENTERIDLE when they wait for input
+        if msg == WM_ENTERIDLE:
+            WATCHDOG.idle()
+        else:
+            WATCHDOG.heartbeat()
+    window = _windows.get(hwnd)
+    if window is not None:
+        if PROFILER.enabled:
+            res = PROFILER.call('message', msg, window.window_proc_callback, hwnd, msg, wparam, lparam)
+        else:
+            res = window.window_proc_callback(hwnd, msg, wparam, lparam)
+    elif hwnd in _old_procs:
+        res = _old_procs[hwnd](hwnd, msg, wparam, lparam)
+    else:
+        res = user32.DefWindowProcW(hwnd, msg, wparam, lparam)
+    if msg == WM_NCDESTROY:
+        _windows.pop(hwnd, None)
+        _old_procs.pop(hwnd, None)
+    return res
+
+SHARED_WNDPROC = WNDPROC(_window_proc)
+
 
 class WNDCLASSEX(Structure):
     def __init__(self, *args, **kwargs):
@@ -57,8 +98,10 @@ class Window(object):
         self.visible = style & WS_VISIBLE
 
         self.__old_proc = None
-        self.__new_proc = None
+        self.__font = None  # owned font, see set_font
         self._message_map = {}
+        self._child_message_map = {}    # msg => {hwnd_child: callback}
+        self._control_message_map = {}  # msg => {control_id: callback}
 
         if wrap_hwnd is not None:
             self.hwnd = wrap_hwnd
@@ -80,24 +123,92 @@ class Window(object):
         if self.__old_proc:
             user32.SetWindowLongPtrW(self.hwnd, GWL_WNDPROC, self.__old_proc)
             self._message_map = {}
+            self._child_message_map = {}
+            self._control_message_map = {}
             self.__old_proc = None
+            _old_procs.pop(self.hwnd, None)
+        if _windows.get(self.hwnd) is self:
+            del _windows[self.hwnd]
         user32.DestroyWindow(self.hwnd)
+        self.release_fonts()
 
     def window_proc_callback(self, hwnd, msg, wparam, lparam):
+        if msg in CHILD_MESSAGES:
+            callback = self._route_child_message(msg, wparam, lparam)
+            if callback is not None:
+                if PROFILER.enabled:
+                    res = PROFILER.call_callback(callback, hwnd, wparam, lparam)
+                else:
+                    res = callback(hwnd, wparam, lparam)
+                if res is not None:
+                    return res
         if msg in self._message_map:
             for callback in self._message_map[msg]:
-                res = callback(hwnd, wparam, lparam)
+                if PROFILER.enabled:
+                    res = PROFILER.call_callback(callback, hwnd, wparam, lparam)
+                else:
+                    res = callback(hwnd, wparam, lparam)
                 if res is not None:
                     return res
+        return self._default_window_proc(hwnd, msg, wparam, lparam)
+
+    def _default_window_proc(self, hwnd, msg, wparam, lparam):
         return self.__old_proc(hwnd, msg, wparam, lparam)
 
+    # For windows whose class already uses SHARED_WNDPROC, so there is nothing to subclass
+    def _attach_window_proc(self):
+        _windows[self.hwnd] = self
+
+    def _route_child_message(self, msg, wparam, lparam):
+        routes = self._child_message_map.get(msg)
+        if msg == WM_NOTIFY:
+            nmhdr = cast(lparam, POINTER(NMHDR)).contents
+            hwnd_child, control_id = nmhdr.hwndFrom, nmhdr.idFrom
+        else:
+            # WM_COMMAND without a control (lparam 0) comes from a menu or accelerator, its id isn't a control id
+            hwnd_child, control_id = lparam, LOWORD(wparam) if msg == WM_COMMAND and lparam else None
+        if routes and hwnd_child in routes:
+            return routes[hwnd_child]
+        routes = self._control_message_map.get(msg)
+        if routes and control_id is not None:
+            return routes.get(control_id)
+
     def register_message_callback(self, msg, callback):
         if msg not in self._message_map:
             self._message_map[msg] = []
         self._message_map[msg].append(callback)
-        if self.__new_proc is None:
-            self.__new_proc = WNDPROC(self.window_proc_callback)
-            self.__old_proc = user32.SetWindowLongPtrW(self.hwnd, GWL_WNDPROC, self.__new_proc)
+        self.__subclass()
+
+    # Registers a handler for a message (WM_CTLCOLOR*, WM_COMMAND or WM_NOTIFY) sent by a single child, identified
+    # either by its HWND or its control id. It's found with a single lookup, no matter how many children are routed.
+    # There is one handler per child and message, registering a different one for a taken slot raises ValueError.
+    def register_child_message_callback(self, msg, callback, hwnd=None, control_id=None):
+        if hwnd is not None:
+            routes, key = self._child_message_map.setdefault(msg, {}), hwnd
+        else:
+            routes, key = self._control_message_map.setdefault(msg, {}), control_id
+        if key in routes and routes[key] != callback:
+            raise ValueError('message {:#06x} of child {} already has a handler'.format(msg, key))
+        routes[key] = callback
+        self.__subclass()
+
+    def unregister_child_message_callback(self, msg, hwnd=None, control_id=None):
+        if hwnd is not None:
+            routes, key = self._child_message_map.get(msg), hwnd
+        else:
+            routes, key = self._control_message_map.get(msg), control_id
+        if routes and key in routes:
+            del routes[key]
+
+    def __subclass(self):
+        if _windows.get(self.hwnd) is self:
+            return
+        if self.hwnd in _old_procs:
+            # already subclassed for a previous wrapper of the same HWND
+            self.__old_proc = _old_procs[self.hwnd]
+        else:
+            self.__old_proc = _old_procs[self.hwnd] = user32.SetWindowLongPtrW(self.hwnd, GWL_WNDPROC, SHARED_WNDPROC)
+        _windows[self.hwnd] = self
 
     def unregister_message_callback(self, msg, callback=None):
         if msg in self._message_map:
@@ -166,15 +277,27 @@ class Window(object):
 #    def send_message(self, msg, wparam=0, lparam=0):
 #        user32.SendMessageW(self.hwnd, msg, wparam, lparam)
 #
-#    # 'MS Shell Dlg',=8
-#    def set_font(self, font_name='Segoe UI', font_size=-11, font_weight=FW_DONTCARE, font_italic=FALSE, hfont=None):
-#        if not hfont:
-#            cHeight = -kernel32.MulDiv(font_size, DPI_Y, 72)
-#            hfont = gdi32.CreateFontW(cHeight, 0, 0, 0, font_weight, font_italic, FALSE, FALSE, ANSI_CHARSET, OUT_TT_PRECIS,
-#                        CLIP_DEFAULT_PRECIS, DEFAULT_QUALITY, DEFAULT_PITCH | FF_DONTCARE, font_name)
-#        user32.SendMessageW(self.hwnd, WM_SETFONT, hfont, MAKELPARAM(1, 0))
-#        self.hfont = hfont
-#
+    # font_size in points. The font is taken from FONT_POOL and released when the window is destroyed (or gets
+    # another font), a given hfont is only used, not owned.
+    def set_font(self, font_name='Segoe UI', font_size=-11, font_weight=FW_DONTCARE, font_italic=FALSE, hfont=None):
+        old_font = self.__font
+        self.__font = None
+        if not hfont:
+            hfont = self.__font = FONT_POOL.acquire(font_name, -kernel32.MulDiv(font_size, FONT_POOL.dpi, 72),
+                    font_weight, font_italic)
+        user32.SendMessageW(self.hwnd, WM_SETFONT, hfont, MAKELPARAM(1, 0))
+        self.hfont = hfont
+        if old_font:
+            FONT_POOL.release(old_font)
+
+    # Releases the fonts of this window and its children, called when it's destroyed
+    def release_fonts(self):
+        for child in self.children:
+            child.release_fonts()
+        if self.__font:
+            FONT_POOL.release(self.__font)
+            self.__font = None
+
 #    def set_parent(self, win=None):
 #        user32.SetParent(self.hwnd, win.hwnd if win else 0)
 
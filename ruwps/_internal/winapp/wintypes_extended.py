@@ -53,6 +53,13 @@ class ACCEL(Structure):
         ("cmd", WORD),
     ]
 
+class NMHDR(Structure):
+    _fields_ = [
+        ('hwndFrom', HWND),
+        ('idFrom', UINT_PTR),
+        ('code', UINT),
+    ]
+
 class COPYDATASTRUCT(Structure):
     _fields_ = [
         ('dwData', LPARAM),
@@ -60,6 +67,13 @@ class COPYDATASTRUCT(Structure):
         ('lpData', LPVOID)
     ]
 
+class POWERBROADCAST_SETTING(Structure):
+    _fields_ = [
+        ('PowerSetting', BYTE * 16),  # GUID
+        ('DataLength', DWORD),
+        ('Data', BYTE * 1),
+    ]
+
 # Macros
 def MAKELONG(wLow, wHigh):
     return LONG(wLow | wHigh << 16).value
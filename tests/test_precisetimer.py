@@ -0,0 +1,53 @@
+import importlib
+import sys
+import threading
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.platform != 'win32', reason='needs Windows')
+
+TIMEOUT = 30
+
+
+def _raise(*args):
+    raise RuntimeError('callback failed')
+
+
+def test_raising_callback_keeps_timers_running(capsys):
+    from ruwps._internal.winapp.precisetimer import PreciseTimers
+    ticked = threading.Event()
+    calls = []
+
+    def on_ticks(ticks):
+        calls.append(ticks)
+        if len(calls) == 2:
+            ticked.set()
+
+    # calls are passed on directly instead of to the UI thread
+    timers = PreciseTimers(lambda func, *args: func(*args))
+    try:
+        timers.add(1, _raise, 0.01)
+        timers.add(2, on_ticks, 0.01)
+        assert ticked.wait(TIMEOUT)
+        assert 1 in timers
+    finally:
+        timers.close()
+    assert 'callback failed' in capsys.readouterr().err
+
+
+def test_raising_tick_doesnt_drop_the_others_in_catchup_mode(capsys):
+    internal = importlib.import_module('ruwps._internal')
+    calls = []
+
+    def callback(sender):
+        calls.append(sender)
+        if len(calls) == 1:
+            raise RuntimeError('callback failed')
+
+    timer = internal.Timer(callback, 1, precise=True, missed='catchup')
+    internal._TIMERS.remove(timer)
+    timer._timer_id = 1
+    timer._on_ticks(3)
+    assert len(calls) == 3
+    assert timer.missed == 2
+    assert 'callback failed' in capsys.readouterr().err
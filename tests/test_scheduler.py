@@ -0,0 +1,68 @@
+import importlib.util
+import os
+import time
+
+# scheduler.py has no Windows dependencies, it's loaded without importing the package
+_spec = importlib.util.spec_from_file_location('scheduler', os.path.join(os.path.dirname(__file__), '..',
+        'ruwps', '_internal', 'winapp', 'scheduler.py'))
+scheduler = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(scheduler)
+
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.armed = []
+
+    def __call__(self, *args):
+        self.armed.append(args)
+
+
+def _raise():
+    raise RuntimeError('callback failed')
+
+
+def test_timer_callback_raises_other_due_timers_still_fire(capsys):
+    timer = FakeTimer()
+    timers = scheduler.TimerScheduler(timer)
+    fired = []
+    timers.add(1, _raise, 0.01, is_singleshot=True)
+    timers.add(2, lambda: fired.append(2), 0.01, is_singleshot=True)
+    timers.add(3, lambda: fired.append(3), 0.01)
+    timers.add(4, lambda: fired.append(4), 60)
+    time.sleep(0.02)
+    timers.fire()
+    assert sorted(fired) == [2, 3]
+    assert 'callback failed' in capsys.readouterr().err
+    assert 1 not in timers and 2 not in timers
+    assert 3 in timers and 4 in timers
+    assert timer.armed[-1][0] is not None
+
+
+def test_timer_callback_raises_timer_is_rearmed():
+    timer = FakeTimer()
+    timers = scheduler.TimerScheduler(timer)
+    timers.add(1, _raise, 0.01)
+    time.sleep(0.02)
+    timer.armed = []
+    timers.fire()
+    assert timer.armed and timer.armed[-1][0] is not None
+    assert 1 in timers
+
+
+def test_wallclock_callback_raises_other_due_jobs_still_run(capsys):
+    timer = FakeTimer()
+    jobs = scheduler.WallClockScheduler(timer)
+    fired = []
+    every_minute = lambda after: after + 60
+    jobs.add(1, _raise, every_minute)
+    jobs.add(2, lambda: fired.append(2), every_minute)
+    for entry in jobs._entries.values():
+        entry[0] = time.time() - 1
+    jobs.recompute()
+    timer.armed = []
+    jobs.fire()
+    assert fired == [2]
+    assert 'callback failed' in capsys.readouterr().err
+    assert 1 in jobs and 2 in jobs
+    assert timer.armed and timer.armed[-1][0] is not None
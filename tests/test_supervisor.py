@@ -0,0 +1,114 @@
+import importlib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.platform != 'win32', reason='needs Windows')
+
+TIMEOUT = 30
+
+
+def _exit_with(code):
+    return [sys.executable, '-c', 'raise SystemExit({})'.format(code)]
+
+
+def _sleep(seconds):
+    return [sys.executable, '-c', 'import time; time.sleep({})'.format(seconds)]
+
+
+def _supervisor(**kwargs):
+    from ruwps._internal.winapp.supervisor import ProcessSupervisor
+    return ProcessSupervisor(**kwargs)
+
+
+def test_exit_is_reported():
+    exited = threading.Event()
+    sup = _supervisor(on_exit=lambda proc: exited.set())
+    proc = sup.start('a', _exit_with(3))
+    assert exited.wait(TIMEOUT)
+    assert proc.returncode == 3
+    assert proc._handle is None
+    sup.close()
+
+
+def test_raising_on_exit_keeps_watching_other_processes(capsys):
+    exits = []
+    exited = threading.Event()
+
+    def on_exit(proc):
+        exits.append(proc.name)
+        exited.set()
+        if proc.name == 'a':
+            raise RuntimeError('on_exit failed')
+
+    sup = _supervisor(on_exit=on_exit)
+    sup.start('a', _exit_with(1))
+    assert exited.wait(TIMEOUT)
+    exited.clear()
+    sup.start('b', _exit_with(2))
+    assert exited.wait(TIMEOUT)
+    assert exits == ['a', 'b']
+    assert sup['b'].returncode == 2
+    assert 'on_exit failed' in capsys.readouterr().err
+    sup.close()
+
+
+def test_close_releases_handles_of_running_processes():
+    sup = _supervisor()
+    proc = sup.start('a', _sleep(TIMEOUT))
+    groups, sup._groups = sup._groups, []
+    try:
+        for group in groups:
+            group.close()
+        assert proc._handle is None
+    finally:
+        sup.close(TIMEOUT)
+
+
+def test_raising_on_exit_still_restarts(capsys):
+    restarted = threading.Event()
+
+    def on_exit(proc):
+        raise RuntimeError('on_exit failed')
+
+    sup = _supervisor(on_exit=on_exit, on_restart=lambda proc: restarted.set(), max_restarts=1, backoff=0.01)
+    proc = sup.start('a', _exit_with(1), restart=True)
+    assert restarted.wait(TIMEOUT)
+    assert proc.restarts == 1
+    assert 'on_exit failed' in capsys.readouterr().err
+    sup.close(TIMEOUT)
+
+
+class _UIThread(object):
+    # stands in for the App: runs the calls on a single thread, exceptions end up in the returned Future
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(1)
+        self._thread_id = self._executor.submit(threading.get_ident).result()
+
+    def call_soon_threadsafe(self, func, *args):
+        return self._executor.submit(func, *args)
+
+    def is_ui_thread(self):
+        return threading.get_ident() == self._thread_id
+
+
+def test_ui_supervisor_reports_failed_restart(monkeypatch, capsys):
+    internal = importlib.import_module('ruwps._internal')
+    monkeypatch.setattr(internal, '_app', _UIThread())
+    exited = threading.Event()
+    sup = internal.Supervisor(on_exit=lambda proc: exited.set(), max_restarts=1, backoff=0.01)
+    proc = sup.start('a', _exit_with(1), restart=True)
+    proc.args = [sys.executable + '-missing']
+    assert exited.wait(TIMEOUT)
+    deadline = time.monotonic() + TIMEOUT
+    while proc.restarts == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert proc.restarts == 1
+    assert not proc.is_running()
+    assert proc.returncode == 1
+    assert 'FileNotFoundError' in capsys.readouterr().err
+    sup.close()